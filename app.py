@@ -4,7 +4,9 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+import atexit
 import base64
+import gzip
 import json
 import os
 import uuid
@@ -12,17 +14,33 @@ import io
 import requests
 import time
 import hashlib
+import heapq
 import hmac
 import re
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict, deque
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import quote
 import matplotlib.pyplot as plt
 import seaborn as sns
+from github import Auth
 from github import Github
 from github import InputFileContent
+from github import GithubException
+from github import InputGitTreeElement
 import xlrd
 import openpyxl
 from PIL import Image
 from io import BytesIO
 
+import excel_reader
+from excel_reader import read_excel_sheet
+
 # Set page configuration
 st.set_page_config(
     page_title="Videmi Services Management",
@@ -31,23 +49,2015 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize session state variables
-if 'clients' not in st.session_state:
-    st.session_state.clients = {}
-    
-    # Add sample client - Dajo Curacao
-    st.session_state.clients["dajo-curacao"] = {
-        "id": "dajo-curacao",
-        "name": "Dajo Curacao",
-        "contact_person": "John Doe",
-        "email": "contact@dajocuracao.com",
-        "phone": "+123456789",
-        "address": "Willemstad, Curacao",
-        "service_type": "Property Management",
-        "notes": "Vacation rental properties",
-        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "reservations": []
+# Storage engine (SQLite)
+DB_PATH = os.environ.get("VIDEMI_DB_PATH", "videmi_services.db")
+
+DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    service_type TEXT,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS reservations (
+    id TEXT PRIMARY KEY,
+    client_id TEXT NOT NULL REFERENCES clients(id) ON DELETE CASCADE,
+    property_name TEXT,
+    guest_name TEXT,
+    guest_email TEXT,
+    check_in_date TEXT,
+    check_out_date TEXT,
+    status TEXT,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_reservations_client_id ON reservations(client_id);
+CREATE INDEX IF NOT EXISTS idx_reservations_check_in_date ON reservations(check_in_date);
+CREATE INDEX IF NOT EXISTS idx_reservations_status ON reservations(status);
+
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password_hash TEXT NOT NULL,
+    role TEXT NOT NULL,
+    name TEXT,
+    email TEXT
+);
+
+CREATE TABLE IF NOT EXISTS activity_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    user TEXT,
+    type TEXT,
+    description TEXT,
+    client_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS activity_archive (
+    name TEXT PRIMARY KEY,
+    first_timestamp TEXT,
+    last_timestamp TEXT,
+    count INTEGER,
+    data BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS import_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS export_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+"""
+
+@st.cache_resource
+def get_db_connection(path=DB_PATH):
+    """Open the SQLite database shared by all sessions and create the schema"""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(DB_SCHEMA)
+    
+    # Databases created before activity entries recorded their client
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(activity_log)")}
+    if "client_id" not in columns:
+        conn.execute("ALTER TABLE activity_log ADD COLUMN client_id TEXT")
+    return conn
+
+@st.cache_resource
+def get_db_lock():
+    """Lock serializing transactions on the shared connection"""
+    return threading.RLock()
+
+def json_default(value):
+    """JSON fallback: records serialize as their dict form, anything else as text"""
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
+
+def _client_row(client):
+    """Build the clients table row for a client (reservations are stored separately)"""
+    client_data = {k: v for k, v in client.items() if k != "reservations"}
+    return (
+        client["id"],
+        client.get("name", ""),
+        client.get("service_type", ""),
+        str(client.get("created_at", "")),
+        json.dumps(client_data, default=json_default)
+    )
+
+def _reservation_row(client_id, reservation):
+    """Build the reservations table row for a reservation"""
+    return (
+        reservation["id"],
+        client_id,
+        reservation.get("property_name", ""),
+        reservation.get("guest_name", ""),
+        reservation.get("guest_email", ""),
+        str(reservation.get("check_in_date", "")),
+        str(reservation.get("check_out_date", "")),
+        reservation.get("status", "Active"),
+        str(reservation.get("created_at", "")),
+        json.dumps(reservation, default=json_default)
+    )
+
+def _history_row(entry):
+    """Build an import/export history table row"""
+    return (str(entry.get("timestamp", "")), json.dumps(entry, default=json_default))
+
+def _user_row(username, user):
+    """Build the users table row for a user"""
+    return (username, user["password_hash"], user["role"], user.get("name", ""), user.get("email", ""))
+
+def _activity_row(entry):
+    """Build an activity log table row"""
+    return (
+        str(entry["timestamp"]), entry.get("user"), entry.get("type"), entry.get("description"), entry.get("client_id")
+    )
+
+def _archive_row(segment, content):
+    """Build an activity archive table row for a segment and its compressed entries"""
+    return (segment["name"], segment["first_timestamp"], segment["last_timestamp"], segment["count"], content)
+
+UPSERT_CLIENT_SQL = """
+INSERT INTO clients (id, name, service_type, created_at, data) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    name = excluded.name,
+    service_type = excluded.service_type,
+    created_at = excluded.created_at,
+    data = excluded.data
+"""
+
+UPSERT_RESERVATION_SQL = """
+INSERT INTO reservations (
+    id, client_id, property_name, guest_name, guest_email,
+    check_in_date, check_out_date, status, created_at, data
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    client_id = excluded.client_id,
+    property_name = excluded.property_name,
+    guest_name = excluded.guest_name,
+    guest_email = excluded.guest_email,
+    check_in_date = excluded.check_in_date,
+    check_out_date = excluded.check_out_date,
+    status = excluded.status,
+    created_at = excluded.created_at,
+    data = excluded.data
+"""
+
+INSERT_ACTIVITY_SQL = """
+INSERT INTO activity_log (timestamp, user, type, description, client_id) VALUES (?, ?, ?, ?, ?)
+"""
+
+INSERT_ARCHIVE_SQL = """
+INSERT OR IGNORE INTO activity_archive (name, first_timestamp, last_timestamp, count, data) VALUES (?, ?, ?, ?, ?)
+"""
+
+UPSERT_USER_SQL = """
+INSERT INTO users (username, password_hash, role, name, email) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(username) DO UPDATE SET
+    password_hash = excluded.password_hash,
+    role = excluded.role,
+    name = excluded.name,
+    email = excluded.email
+"""
+
+def db_save_client(client):
+    """Insert or update a single client row"""
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        conn.execute(UPSERT_CLIENT_SQL, _client_row(client))
+
+def db_delete_client(client_id):
+    """Delete a client and all of its reservations"""
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        conn.execute("DELETE FROM reservations WHERE client_id = ?", (client_id,))
+        conn.execute("DELETE FROM clients WHERE id = ?", (client_id,))
+
+def db_save_reservations(client_id, reservations):
+    """Insert or update reservation rows for a client in one transaction"""
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        conn.executemany(
+            UPSERT_RESERVATION_SQL,
+            [_reservation_row(client_id, reservation) for reservation in reservations]
+        )
+
+def db_clear_reservations():
+    """Delete every reservation row"""
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        conn.execute("DELETE FROM reservations")
+
+def db_clear_clients():
+    """Delete every client and reservation row"""
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        conn.execute("DELETE FROM reservations")
+        conn.execute("DELETE FROM clients")
+
+def db_save_user(username, user):
+    """Insert or update a single user row"""
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        conn.execute(UPSERT_USER_SQL, _user_row(username, user))
+
+def db_delete_user(username):
+    """Delete a single user row"""
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        conn.execute("DELETE FROM users WHERE username = ?", (username,))
+
+def db_add_activity(entry):
+    """Append an activity log row"""
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        conn.execute(
+            INSERT_ACTIVITY_SQL,
+            _activity_row(entry)
+        )
+
+def db_clear_activity_log():
+    """Delete every activity log row"""
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        conn.execute("DELETE FROM activity_log")
+
+def db_archive_activity(count, segments):
+    """Move the oldest count activity log rows into archive segments in one transaction
+
+    segments holds (segment, compressed entries) pairs covering those rows.
+    """
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        conn.execute("DELETE FROM activity_log WHERE id IN (SELECT id FROM activity_log ORDER BY id LIMIT ?)", (count,))
+        conn.executemany(INSERT_ARCHIVE_SQL, [_archive_row(segment, content) for segment, content in segments])
+
+def db_save_archive_segments(segments):
+    """Store archive segments given as (segment, compressed entries) pairs, keeping existing ones"""
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        conn.executemany(INSERT_ARCHIVE_SQL, [_archive_row(segment, content) for segment, content in segments])
+
+def db_delete_archive_segments(names):
+    """Delete archive segments by name"""
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        conn.executemany("DELETE FROM activity_archive WHERE name = ?", [(name,) for name in names])
+
+def db_add_history(table, entry):
+    """Append a row to the import_history or export_history table"""
+    if table not in ("import_history", "export_history"):
+        raise ValueError(f"Unknown history table: {table}")
+
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        conn.execute(f"INSERT INTO {table} (timestamp, data) VALUES (?, ?)", _history_row(entry))
+
+def db_load_clients():
+    """Load all clients with their reservations, preserving insertion order"""
+    conn = get_db_connection()
+    with get_db_lock():
+        client_rows = conn.execute("SELECT data FROM clients ORDER BY rowid").fetchall()
+        reservation_rows = conn.execute("SELECT client_id, data FROM reservations ORDER BY rowid").fetchall()
+
+    clients = {}
+    for row in client_rows:
+        client = Client(json.loads(row["data"]))
+        client["reservations"] = []
+        clients[client["id"]] = client
+
+    for row in reservation_rows:
+        if row["client_id"] in clients:
+            clients[row["client_id"]]["reservations"].append(Reservation(json.loads(row["data"])))
+
+    return clients
+
+def db_load_users():
+    """Load all users keyed by username"""
+    conn = get_db_connection()
+    with get_db_lock():
+        rows = conn.execute("SELECT * FROM users ORDER BY rowid").fetchall()
+
+    return {
+        row["username"]: {
+            "password_hash": row["password_hash"],
+            "role": row["role"],
+            "name": row["name"],
+            "email": row["email"]
+        }
+        for row in rows
+    }
+
+def db_load_activity_log():
+    """Load the activity log in insertion order"""
+    conn = get_db_connection()
+    with get_db_lock():
+        rows = conn.execute("SELECT timestamp, user, type, description, client_id FROM activity_log ORDER BY id").fetchall()
+
+    return [
+        {key: value for key, value in dict(row).items() if key != "client_id" or value is not None}
+        for row in rows
+    ]
+
+def db_load_archive_index():
+    """Metadata of every activity archive segment, oldest first"""
+    conn = get_db_connection()
+    with get_db_lock():
+        rows = conn.execute(
+            "SELECT name, first_timestamp, last_timestamp, count FROM activity_archive ORDER BY first_timestamp, rowid"
+        ).fetchall()
+
+    return [dict(row) for row in rows]
+
+def db_load_archive_segment(name):
+    """Entries of an activity archive segment, or None if there is no such segment"""
+    conn = get_db_connection()
+    with get_db_lock():
+        row = conn.execute("SELECT data FROM activity_archive WHERE name = ?", (name,)).fetchone()
+
+    return None if row is None else decode_snapshot(row["data"])[0]
+
+def db_load_history(table):
+    """Load the import_history or export_history table in insertion order"""
+    if table not in ("import_history", "export_history"):
+        raise ValueError(f"Unknown history table: {table}")
+
+    conn = get_db_connection()
+    with get_db_lock():
+        rows = conn.execute(f"SELECT data FROM {table} ORDER BY id").fetchall()
+
+    return [json.loads(row["data"]) for row in rows]
+
+def db_replace_all(data):
+    """Replace the whole database with the given data in one transaction (used by load/restore)"""
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        for table in ("reservations", "clients", "activity_log", "import_history", "export_history"):
+            conn.execute(f"DELETE FROM {table}")
+
+        clients = data.get("clients", {})
+        conn.executemany(UPSERT_CLIENT_SQL, [_client_row(client) for client in clients.values()])
+        conn.executemany(
+            UPSERT_RESERVATION_SQL,
+            [
+                _reservation_row(client_id, reservation)
+                for client_id, client in clients.items()
+                for reservation in client.get("reservations", [])
+            ]
+        )
+
+        if data.get("users"):
+            conn.execute("DELETE FROM users")
+            conn.executemany(UPSERT_USER_SQL, [_user_row(username, user) for username, user in data["users"].items()])
+
+        conn.executemany(
+            INSERT_ACTIVITY_SQL,
+            [_activity_row(entry) for entry in data.get("activity_log", [])]
+        )
+        conn.executemany(
+            "INSERT INTO import_history (timestamp, data) VALUES (?, ?)",
+            [_history_row(entry) for entry in data.get("import_history", [])]
+        )
+        conn.executemany(
+            "INSERT INTO export_history (timestamp, data) VALUES (?, ?)",
+            [_history_row(entry) for entry in data.get("export_history", [])]
+        )
+
+def db_apply_changes(changes):
+    """Write part of the data in one transaction (used by incremental loads)
+
+    changes["clients"] maps client ids to the new client, or None to delete it.
+    "users", "activity_log", "import_history" and "export_history", when present,
+    replace those tables.
+    """
+    conn = get_db_connection()
+    with get_db_lock(), conn:
+        for client_id, client in changes.get("clients", {}).items():
+            conn.execute("DELETE FROM reservations WHERE client_id = ?", (client_id,))
+            if client is None:
+                conn.execute("DELETE FROM clients WHERE id = ?", (client_id,))
+                continue
+            
+            conn.execute(UPSERT_CLIENT_SQL, _client_row(client))
+            conn.executemany(
+                UPSERT_RESERVATION_SQL,
+                [_reservation_row(client_id, reservation) for reservation in client.get("reservations", [])]
+            )
+
+        if "users" in changes:
+            conn.execute("DELETE FROM users")
+            conn.executemany(UPSERT_USER_SQL, [_user_row(username, user) for username, user in changes["users"].items()])
+
+        if "activity_log" in changes:
+            conn.execute("DELETE FROM activity_log")
+            conn.executemany(
+                INSERT_ACTIVITY_SQL,
+                [_activity_row(entry) for entry in changes["activity_log"]]
+            )
+
+        for table in ("import_history", "export_history"):
+            if table in changes:
+                conn.execute(f"DELETE FROM {table}")
+                conn.executemany(
+                    f"INSERT INTO {table} (timestamp, data) VALUES (?, ?)",
+                    [_history_row(entry) for entry in changes[table]]
+                )
+
+# GitHub storage layout: one file per client plus small files for users and logs
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+GITHUB_DATA_FILE = "videmi_services_data.json"  # Legacy single-file snapshot
+GITHUB_DATA_DIR = "videmi_services_data"
+GITHUB_SINGLETON_SHARDS = ("users", "activity_log", "import_history", "export_history")
+GITHUB_ARCHIVE_DIR = "activity_archive"  # One immutable shard per activity archive segment
+GITHUB_FETCH_WORKERS = 8
+GITHUB_POOL_SIZE = GITHUB_FETCH_WORKERS + 2  # Keep-alive connections per client
+GITHUB_BLOB_CACHE_BYTES = 64 * 1024 * 1024
+GITHUB_COMMIT_ATTEMPTS = 5  # Rebuilds of a commit when the branch moves during a save
+GITHUB_COMPARE_MAX_FILES = 300  # The compare API lists at most this many changed files
+
+# Snapshot format: compact JSON inside gzip, with dates stored as integers
+SNAPSHOT_FORMAT = "videmi-snapshot"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_EXTENSION = ".json.gz"
+LEGACY_SNAPSHOT_EXTENSION = ".json"  # Version 1: indent-2 JSON with string dates
+SNAPSHOT_EPOCH = datetime(1970, 1, 1)
+SNAPSHOT_FIELD_TYPES = {
+    "check_in_date": "epoch_day",
+    "check_out_date": "epoch_day",
+    "created_at": "epoch_second",
+    "updated_at": "epoch_second",
+    "cancelled_at": "epoch_second",
+    "timestamp": "epoch_second"
+}
+SNAPSHOT_TYPE_FORMATS = {
+    "epoch_day": "%Y-%m-%d",
+    "epoch_second": "%Y-%m-%d %H:%M:%S"
+}
+CANONICAL_DATE_PATTERNS = {
+    "epoch_day": re.compile(r"\d{4}-\d{2}-\d{2}"),
+    "epoch_second": re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+}
+
+def _encode_snapshot_value(value, value_type):
+    """Convert a date string to an integer, leaving anything else untouched"""
+    if not isinstance(value, str):
+        return value
+    
+    try:
+        parsed = datetime.strptime(value, SNAPSHOT_TYPE_FORMATS[value_type])
+    except ValueError:
+        return value
+    
+    if value_type == "epoch_day":
+        return (parsed - SNAPSHOT_EPOCH).days
+    return int((parsed - SNAPSHOT_EPOCH).total_seconds())
+
+def _decode_snapshot_value(value, value_type):
+    """Convert an integer back to the date string used in memory"""
+    if not isinstance(value, int) or isinstance(value, bool):
+        return normalize_date_value(value, value_type)
+    
+    if value_type == "epoch_day":
+        parsed = SNAPSHOT_EPOCH + timedelta(days=value)
+    else:
+        parsed = SNAPSHOT_EPOCH + timedelta(seconds=value)
+    return parsed.strftime(SNAPSHOT_TYPE_FORMATS[value_type])
+
+def _convert_snapshot_fields(data, convert, field_types):
+    """Apply convert to every typed field, at any depth"""
+    if isinstance(data, Mapping):
+        return {
+            key: convert(value, field_types[key]) if key in field_types
+            else _convert_snapshot_fields(value, convert, field_types)
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [_convert_snapshot_fields(item, convert, field_types) for item in data]
+    return data
+
+def normalize_date_value(value, value_type):
+    """Canonical string for a date or timestamp in any parseable form
+
+    Strings already in the canonical format are returned without parsing.
+    Values that cannot be parsed (and numbers, which are ambiguous) are kept.
+    """
+    if isinstance(value, str):
+        if not value.strip() or CANONICAL_DATE_PATTERNS[value_type].fullmatch(value):
+            return value
+    elif value is None or isinstance(value, (bool, int, float)):
+        return value
+    
+    try:
+        parsed = pd.to_datetime(value)
+    except (ValueError, TypeError, OverflowError):
+        return value
+    
+    if pd.isna(parsed):
+        return value
+    return parsed.strftime(SNAPSHOT_TYPE_FORMATS[value_type])
+
+def normalize_date_column(column, value_type):
+    """Normalize a DataFrame column of dates, parsing each distinct value once"""
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column.dt.strftime(SNAPSHOT_TYPE_FORMATS[value_type]).astype(object).where(column.notna(), "")
+    
+    normalized = {}
+    pending = []
+    for value in column.dropna().unique():
+        if isinstance(value, str) and value.strip() and not CANONICAL_DATE_PATTERNS[value_type].fullmatch(value):
+            pending.append(value)
+        else:
+            normalized[value] = normalize_date_value(value, value_type)
+    
+    if pending:
+        # Other strings usually share one format, so parse them together and
+        # only fall back to one at a time for those the common format misses
+        parsed = pd.to_datetime(pd.Series(pending, dtype=object), errors="coerce")
+        formatted = parsed.dt.strftime(SNAPSHOT_TYPE_FORMATS[value_type])
+        for value, text, valid in zip(pending, formatted, parsed.notna()):
+            normalized[value] = text if valid else normalize_date_value(value, value_type)
+    
+    return column.map(normalized).where(column.notna(), column)
+
+def normalize_dates(data):
+    """Normalize every date and timestamp field, at any depth"""
+    return _convert_snapshot_fields(data, normalize_date_value, SNAPSHOT_FIELD_TYPES)
+
+def normalize_email(value):
+    """Lowercase, trimmed form of an email address used for lookups"""
+    return str(value or "").strip().lower()
+
+def encode_snapshot(data):
+    """Serialize data to the current snapshot format (gzip-compressed bytes)
+
+    The gzip header carries no timestamp, so equal data always gives equal bytes.
+    """
+    payload = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "types": SNAPSHOT_FIELD_TYPES,
+        "data": _convert_snapshot_fields(data, _encode_snapshot_value, SNAPSHOT_FIELD_TYPES)
+    }
+    content = json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=json_default)
+    return gzip.compress(content.encode(), mtime=0)
+
+def decode_snapshot(content):
+    """Parse a snapshot in any known format and return (data, format version)
+
+    Gzip is detected from its magic bytes; plain JSON without a format header is
+    the version 1 indent-2 snapshot. Dates come back in their canonical string form.
+    """
+    if content[:2] == b"\x1f\x8b":
+        content = gzip.decompress(content)
+    
+    payload = json.loads(content.decode())
+    if not isinstance(payload, dict) or payload.get("format") != SNAPSHOT_FORMAT:
+        return normalize_dates(payload), 1
+    
+    version = payload.get("version", SNAPSHOT_VERSION)
+    if version > SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot version {version} is newer than this application supports ({SNAPSHOT_VERSION})")
+    
+    field_types = payload.get("types", SNAPSHOT_FIELD_TYPES)
+    return _convert_snapshot_fields(payload["data"], _decode_snapshot_value, field_types), version
+
+def archive_segment(entries, name=None):
+    """(segment metadata, compressed entries) for a run of activity log entries
+
+    Unless a name is given, it is the first timestamp followed by a hash of the
+    content, so segments sort by time and the same entries make the same segment.
+    """
+    content = encode_snapshot(entries)
+    first_timestamp = str(entries[0].get("timestamp", "")) if entries else ""
+    segment = {
+        "name": name or f"{re.sub(r'[^0-9]', '', first_timestamp)}-{hashlib.sha1(content).hexdigest()[:12]}",
+        "first_timestamp": first_timestamp,
+        "last_timestamp": str(entries[-1].get("timestamp", "")) if entries else "",
+        "count": len(entries)
     }
+    return segment, content
+
+def archive_shard_path(name):
+    """Name of an activity archive segment's shard inside the GitHub data directory"""
+    return f"{GITHUB_ARCHIVE_DIR}/{name}"
+
+# Background writer: saves arriving within the debounce window are merged into one commit
+SAVE_DEBOUNCE_SECONDS = float(os.environ.get("VIDEMI_SAVE_DEBOUNCE_SECONDS", "2.0"))
+SAVE_MAX_DELAY_SECONDS = float(os.environ.get("VIDEMI_SAVE_MAX_DELAY_SECONDS", "10.0"))
+WRITER_MAX_CONFLICTS = 50
+
+# Shared data store: one copy of the application data for every session in this process
+DATA_STORE_FIELDS = ("clients", "users", "activity_log", "import_history", "export_history")
+ACTIVITY_INDEX_FIELDS = ("type", "user", "client_id")
+ACTIVITY_LOG_HOT_LIMIT = 1000  # Newest entries kept in memory and in the activity log shard
+ACTIVITY_ARCHIVE_SEGMENT_SIZE = 500  # Older entries move to compressed segments this many at a time
+
+class ReadWriteLock:
+    """Lock that admits any number of readers or a single writer
+
+    The writer may re-enter and may take the read side too, but a reader must not
+    ask for the lock again. Waiting writers hold back new readers so a steady
+    stream of page renders cannot starve them.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._condition:
+            if self._writer != threading.get_ident():
+                while self._writer is not None or self._waiting_writers:
+                    self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            if self._writer != threading.get_ident():
+                self._waiting_writers += 1
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+                self._waiting_writers -= 1
+                self._writer = threading.get_ident()
+            self._writer_depth += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                self._condition.notify_all()
+
+_MISSING = object()
+
+class Record(MutableMapping):
+    """Dict-shaped record: known fields live in slots, any other key in a side dict
+
+    Records stand in for the plain dicts the pages use (get, items, ** unpacking,
+    == against dicts, copy() returning a dict) at a fraction of the memory. Keys
+    iterate in FIELDS order, then extra keys in insertion order. Strings in
+    INTERNED_FIELDS repeat across records (dates, statuses) and are shared.
+    """
+
+    __slots__ = ("_extra",)
+    FIELDS = ()
+    INTERNED_FIELDS = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_names = frozenset(cls.FIELDS)
+
+    def __init__(self, data=()):
+        self._extra = None
+        for key, value in (data.items() if isinstance(data, Mapping) else data):
+            self[key] = value
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Records for equal-length lists of values keyed by field, one record per position"""
+        names = list(columns)
+        values = [
+            [sys.intern(value) if type(value) is str else value for value in columns[name]]
+            if name in cls.INTERNED_FIELDS else columns[name]
+            for name in names
+        ]
+        
+        records = [cls() for _ in range(len(values[0]) if values else 0)]
+        for name, column in zip(names, values):
+            if name in cls._field_names:
+                # Set the slot through its descriptor for the whole column at once
+                deque(map(getattr(cls, name).__set__, records, column), maxlen=0)
+            else:
+                for record, value in zip(records, column):
+                    record[name] = value
+        return records
+
+    def __getitem__(self, key):
+        if key in self._field_names:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._field_names:
+            if key in self.INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._field_names:
+            if not hasattr(self, key):
+                raise KeyError(key)
+            delattr(self, key)
+        else:
+            if self._extra is None or key not in self._extra:
+                raise KeyError(key)
+            del self._extra[key]
+            if not self._extra:
+                self._extra = None
+
+    def __iter__(self):
+        for name in self.FIELDS:
+            if hasattr(self, name):
+                yield name
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(hasattr(self, name) for name in self.FIELDS) + len(self._extra or ())
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def copy(self):
+        return dict(self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+class Reservation(Record):
+    """A reservation, in the field order the reservation form writes"""
+
+    __slots__ = FIELDS = (
+        "id", "property_name", "guest_name", "guest_email", "guest_phone",
+        "check_in_date", "check_out_date", "num_guests", "amount", "client_profile", "notes",
+        "status", "created_at", "created_by", "imported", "cancelled_at", "cancelled_by"
+    )
+    INTERNED_FIELDS = frozenset((
+        "property_name", "check_in_date", "check_out_date", "client_profile", "status",
+        "created_by", "cancelled_by"
+    ))
+
+class Client(Record):
+    """A client with its list of Reservation records"""
+
+    __slots__ = FIELDS = (
+        "id", "name", "contact_person", "email", "phone", "address", "service_type",
+        "notes", "created_at", "updated_at", "reservations"
+    )
+    INTERNED_FIELDS = frozenset(("service_type",))
+
+def compact_reservation(reservation):
+    """Reservation record for a reservation dict (records are returned as they are)"""
+    return reservation if isinstance(reservation, Reservation) else Reservation(reservation)
+
+def compact_client(client):
+    """Client record for a client dict, with its reservations as records"""
+    record = Client(client)
+    record["reservations"] = [compact_reservation(reservation) for reservation in client.get("reservations", [])]
+    return record
+
+def compact_clients(clients):
+    """Client records for a dict of clients keyed by ID"""
+    return {client_id: compact_client(client) for client_id, client in clients.items()}
+
+class ReservationIntervals:
+    """Sorted interval index over (check_in, check_out) of one reservation frame
+
+    Queries return the matching rows of the frame, in frame order. Window queries do a
+    binary search on the sorted check-in dates. For overlap queries the check-ins
+    are also split by stay length, in classes that double in length, and each
+    class widens its window by its own longest stay, so a few long-term rentals
+    do not make every overlap query scan months of short stays. Reservations
+    without a date are kept apart and only returned where the pages expect them.
+    """
+
+    def __init__(self, frame, client_id=None):
+        self.frame = frame
+        if client_id is None:
+            rows = np.arange(len(frame))
+        else:
+            rows = np.flatnonzero((frame["client_id"] == client_id).to_numpy())
+        
+        check_in = frame["check_in"].to_numpy()[rows]
+        check_out = frame["check_out"].to_numpy()[rows]
+        
+        dated_in = ~np.isnat(check_in)
+        order = np.argsort(check_in[dated_in], kind="stable")
+        self.starts = check_in[dated_in][order]
+        self.start_rows = rows[dated_in][order]
+        self.start_ends = check_out[dated_in][order]
+        self.undated_start_rows = rows[~dated_in]
+        
+        dated_out = ~np.isnat(check_out)
+        order = np.argsort(check_out[dated_out], kind="stable")
+        self.ends = check_out[dated_out][order]
+        self.end_rows = rows[dated_out][order]
+        self.undated_end_rows = rows[~dated_out]
+        
+        # (check-ins, rows, check-outs, longest stay) per stay class, in check-in order
+        stays = self.start_ends - self.starts
+        with_stay = np.flatnonzero(~np.isnat(stays))
+        days = np.maximum(stays[with_stay] / np.timedelta64(1, "D"), 1)
+        classes = np.ceil(np.log2(days)).astype(int)
+        self.stay_classes = []
+        for stay_class in np.unique(classes):
+            members = with_stay[classes == stay_class]
+            self.stay_classes.append((
+                self.starts[members], self.start_rows[members], self.start_ends[members],
+                max(stays[members].max(), np.timedelta64(0, "s"))
+            ))
+
+    def _rows(self, *parts):
+        """Frame rows at the given positions, in frame order"""
+        return self.frame.iloc[np.sort(np.concatenate(parts))]
+
+    def _start_range(self, start, end):
+        """Slice of the sorted check-ins from start to end inclusive"""
+        return slice(
+            np.searchsorted(self.starts, np.datetime64(start), side="left"),
+            np.searchsorted(self.starts, np.datetime64(end), side="right")
+        )
+
+    def starting_between(self, start, end):
+        """Rows checking in from start to end inclusive"""
+        return self._rows(self.start_rows[self._start_range(start, end)])
+
+    def starting_from(self, date, include_undated=True):
+        """Rows checking in on or after date, plus rows without a check-in unless excluded"""
+        first = np.searchsorted(self.starts, np.datetime64(date), side="left")
+        if not include_undated:
+            return self._rows(self.start_rows[first:])
+        return self._rows(self.start_rows[first:], self.undated_start_rows)
+
+    def ending_before(self, date):
+        """Rows checking out before date, plus rows without a check-out"""
+        last = np.searchsorted(self.ends, np.datetime64(date), side="left")
+        return self._rows(self.end_rows[:last], self.undated_end_rows)
+
+    def overlapping(self, start, end):
+        """Rows with both dates whose stay overlaps start to end inclusive"""
+        start, end = np.datetime64(start), np.datetime64(end)
+        parts = [self.start_rows[:0]]
+        for starts, rows, ends, longest_stay in self.stay_classes:
+            window = slice(
+                np.searchsorted(starts, start - longest_stay, side="left"),
+                np.searchsorted(starts, end, side="right")
+            )
+            parts.append(rows[window][ends[window] >= start])
+        return self._rows(*parts)
+
+class PropertyCalendar:
+    """Booked nights per (client_id, property_name), for overbooking checks
+
+    A stay occupies the nights from check-in up to the day before check-out, so
+    back-to-back stays do not clash. Cancelled reservations and ones without a
+    property or both dates occupy nothing. Checking a stay costs one lookup per
+    night, whatever the number of reservations.
+    """
+
+    def __init__(self):
+        self.nights = {}
+        self.booked = {}
+
+    @staticmethod
+    def _stays(frame):
+        """(frame position, reservation ID, property key, first night, end night) for rows that book nights"""
+        books = (
+            (frame["status"] != "Cancelled").to_numpy()
+            & frame["check_in"].notna().to_numpy()
+            & frame["check_out"].notna().to_numpy()
+            & (frame["property_name"] != "").to_numpy()
+        )
+        positions = np.flatnonzero(books)
+        rows = frame.iloc[positions]
+        return zip(
+            positions,
+            rows["id"],
+            zip(rows["client_id"].astype(str), rows["property_name"].astype(str)),
+            rows["check_in"].to_numpy().astype("datetime64[D]").astype(np.int64),
+            rows["check_out"].to_numpy().astype("datetime64[D]").astype(np.int64)
+        )
+
+    def add(self, frame):
+        """Book the nights of every row in a reservation frame"""
+        for _, reservation_id, key, start, end in self._stays(frame):
+            if reservation_id is None or start >= end:
+                continue
+            self.booked[reservation_id] = (key, start, end)
+            nights = self.nights.setdefault(key, {})
+            for night in range(start, end):
+                nights.setdefault(night, []).append(reservation_id)
+
+    def remove(self, reservation_ids):
+        """Free the nights of the given reservations"""
+        for reservation_id in reservation_ids:
+            entry = self.booked.pop(reservation_id, None)
+            if entry is None:
+                continue
+            key, start, end = entry
+            nights = self.nights[key]
+            for night in range(start, end):
+                nights[night].remove(reservation_id)
+                if not nights[night]:
+                    del nights[night]
+            if not nights:
+                del self.nights[key]
+
+    def conflicts(self, key, start, end):
+        """IDs of reservations booked on any night from start up to end"""
+        nights = self.nights.get(key, {})
+        conflicts = {}
+        for night in range(start, end):
+            conflicts.update(dict.fromkeys(nights.get(night, ())))
+        return list(conflicts)
+
+    def sweep(self, frame):
+        """Check a batch of new reservations against the calendar and against each other
+
+        Rows are swept in check-in order per property, so every overlap in the
+        batch is found in one pass. Returns (frame position, conflicting IDs) for
+        each row that would overbook; the remaining rows fit together.
+        """
+        stays = sorted(self._stays(frame), key=lambda stay: (stay[2], stay[3]))
+        latest = {}
+        rejected = []
+        
+        for position, reservation_id, key, start, end in stays:
+            conflicts = self.conflicts(key, start, end)
+            if key in latest and latest[key][0] > start:
+                conflicts.append(latest[key][1])
+            
+            if conflicts:
+                rejected.append((int(position), conflicts))
+            elif key not in latest or end > latest[key][0]:
+                latest[key] = (end, reservation_id)
+        
+        return sorted(rejected)
+
+class ValueTable:
+    """Distinct values of a field with the number of records holding each
+
+    Values keep the order they first appeared in, and leave the table when their
+    count drops to zero, so option lists never need a scan over the records.
+    """
+
+    def __init__(self, values=()):
+        self.counts = {}
+        for value in values:
+            self.add(value)
+
+    def add(self, value, count=1):
+        self.counts[value] = self.counts.get(value, 0) + count
+
+    def remove(self, value, count=1):
+        remaining = self.counts.get(value, 0) - count
+        if remaining > 0:
+            self.counts[value] = remaining
+        else:
+            self.counts.pop(value, None)
+
+    def values(self):
+        """Current values, skipping empty ones"""
+        return [value for value in list(self.counts) if value not in ("", None)]
+
+    def __contains__(self, value):
+        return value in self.counts
+
+class LogIndex:
+    """Entries of a log grouped by the values of some fields, in log order
+
+    The groups double as value tables for filter options, and an equality filter
+    is a lookup instead of a scan. Indexed values are interned.
+    """
+
+    def __init__(self, fields, entries=()):
+        self.groups = {field: {} for field in fields}
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        for field, groups in self.groups.items():
+            value = entry.get(field)
+            if type(value) is str:
+                value = entry[field] = sys.intern(value)
+            groups.setdefault(value, []).append(entry)
+
+    def values(self, field):
+        """Values of a field present in the log"""
+        return [value for value in list(self.groups[field]) if value not in ("", None)]
+
+    def entries(self, **filters):
+        """Entries matching every field=value filter, in log order (None if no filter is given)"""
+        matches = [self.groups[field].get(value, []) for field, value in filters.items()]
+        if not matches:
+            return None
+        
+        smallest = min(matches, key=len)
+        return [
+            entry for entry in smallest
+            if all(entry.get(field) == value for field, value in filters.items())
+        ]
+
+class SearchTerm:
+    """One word of a search query: the words of a WordIndex it matches and their weights
+
+    A term matches the words it is a prefix of, weighted by how much of the word
+    it covers, or failing those its near misses (see WordIndex.near_misses).
+    """
+
+    def __init__(self, index, term):
+        self.index = index
+        self.term = term
+        self.near_misses = None
+        if next(index.completions(term), None) is None:
+            self.near_misses = index.near_misses(term)
+
+    def words(self):
+        """Matched words, best first"""
+        if self.near_misses is None:
+            return self.index.completions(self.term)
+        return iter(sorted(self.near_misses, key=self.near_misses.get, reverse=True))
+
+    def weight(self, word):
+        """Weight of a word for this term (0 if it does not match)"""
+        if self.near_misses is None:
+            return 0.5 + 0.5 * len(self.term) / len(word) if word.startswith(self.term) else 0
+        return self.near_misses.get(word, 0)
+
+class WordIndex:
+    """Words and trigrams of the documents of one kind, for SearchIndex
+
+    Words map to the documents that contain them and each word's trigrams map
+    back to the word, by word length.
+    """
+
+    FUZZY_GRAM_WORDS = 1000  # Trigrams in more words than this only count towards near misses found through rarer ones
+    FUZZY_CANDIDATES = 24  # Near misses with the most shared trigrams whose edit distance is checked
+
+    def __init__(self):
+        self.words = {}
+        self.grams = {}
+        self.documents = {}
+
+    @staticmethod
+    def trigrams(word):
+        """Trigrams of a word padded with two spaces in front and one behind"""
+        padded = f"  {word} "
+        return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+    @staticmethod
+    def distance(a, b, limit):
+        """Edit distance with adjacent transpositions, or limit + 1 once it exceeds limit"""
+        previous, current = None, list(range(len(b) + 1))
+        for i in range(1, len(a) + 1):
+            previous, current, row = current, [i] + [0] * len(b), previous
+            for j in range(1, len(b) + 1):
+                current[j] = min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (a[i - 1] != b[j - 1])
+                )
+                if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                    current[j] = min(current[j], row[j - 2] + 1)
+            if min(current) > limit:
+                return limit + 1
+        return current[-1]
+
+    def add(self, key, words):
+        self.documents[key] = words
+        for word in words:
+            if word not in self.words:
+                self.words[word] = set()
+                for gram in self.trigrams(word):
+                    self.grams.setdefault(gram, {}).setdefault(len(word), set()).add(word)
+            self.words[word].add(key)
+
+    def remove(self, key):
+        for word in self.documents.pop(key, ()):
+            keys = self.words[word]
+            keys.discard(key)
+            if not keys:
+                del self.words[word]
+                for gram in set(self.trigrams(word)):
+                    lengths = self.grams[gram]
+                    lengths[len(word)].discard(word)
+                    if not lengths[len(word)]:
+                        del lengths[len(word)]
+                        if not lengths:
+                            del self.grams[gram]
+
+    def completions(self, term):
+        """Words the term is a prefix of, shortest (so best matching) first
+
+        Words come from the rarest of the term's leading trigrams one length at
+        a time, so a short term only produces as many as a search uses.
+        """
+        lengths = min(
+            (self.grams.get(gram, {}) for gram in self.trigrams(term)[:len(term)]),
+            key=lambda lengths: sum(len(words) for length, words in lengths.items() if length >= len(term))
+        )
+        for length in sorted(length for length in lengths if length >= len(term)):
+            for word in lengths[length]:
+                if word.startswith(term):
+                    yield word
+
+    def near_misses(self, term):
+        """Weighted words within a small edit distance of a term
+
+        A word within the edit limit shares all but 4 trigrams per edit with the
+        term. Shared trigrams are counted for words of a possible length, rarest
+        trigram first; a common one (such as those of a word in every email
+        address) only adds to the counts of words already found. The words
+        sharing the most then have their edit distance checked.
+        """
+        if len(term) < 3:
+            return {}
+        
+        limit = 1 if len(term) < 8 else 2
+        lengths = range(len(term) - limit, len(term) + limit + 1)
+        grams = [
+            [words for length, words in self.grams.get(gram, {}).items() if length in lengths]
+            for gram in self.trigrams(term)
+        ]
+        shared = {}
+        for buckets in sorted(grams, key=lambda buckets: sum(map(len, buckets))):
+            common = sum(map(len, buckets)) > self.FUZZY_GRAM_WORDS
+            for words in buckets:
+                for word in words.intersection(shared) if common else words:
+                    shared[word] = shared.get(word, 0) + 1
+        
+        needed = len(term) + 1 - 4 * limit
+        candidates = [word for word, count in shared.items() if count >= needed]
+        matches = {}
+        for word in heapq.nlargest(self.FUZZY_CANDIDATES, candidates, key=shared.get):
+            distance = self.distance(term, word, limit)
+            if distance <= limit:
+                matches[word] = 0.5 - 0.2 * distance
+        return matches
+
+    def _count(self, term, bound):
+        """Documents holding the words a term matches (with repeats), counted until past bound"""
+        count = 0
+        for word in term.words():
+            count += len(self.words[word])
+            if count > bound:
+                break
+        return count
+
+    def _narrow(self, scores, term):
+        """Scores of the documents that also contain a word the term matches, plus its weight"""
+        narrowed = {}
+        words = list(islice(term.words(), 9))
+        if len(words) <= 8:
+            # Few words: intersect their documents with the candidates
+            for word in words:
+                for key in self.words[word].intersection(scores):
+                    if key not in narrowed:
+                        narrowed[key] = scores[key] + term.weight(word)
+        else:
+            # Many words (a short prefix): weigh the candidates' own words instead
+            for key, score in scores.items():
+                weight = max(map(term.weight, self.documents[key]), default=0)
+                if weight:
+                    narrowed[key] = score + weight
+        return narrowed
+
+    def _documents(self, term):
+        """(weight, key) of the documents holding the words a term matches, best first, with repeats"""
+        for word in term.words():
+            weight = term.weight(word)
+            for key in self.words[word]:
+                yield weight, key
+
+    def _score(self, key, terms):
+        """Sum over the terms of the best weight among a document's words (None if a term matches none)"""
+        score = 0
+        for term in terms:
+            weight = max(map(term.weight, self.documents[key]), default=0)
+            if not weight:
+                return None
+            score += weight
+        return score
+
+    def _top(self, terms, limit):
+        """(score, key) of the limit best documents matching every term, best first
+
+        Each term's documents are taken best first, one term after the other,
+        and scored in full. An unseen document weighs at most the current
+        weight of each term, so the walk stops once the limit-th best score
+        reaches their sum, or once a term runs out (every match is seen then).
+        """
+        documents = [self._documents(term) for term in terms]
+        others = [terms[:number] + terms[number + 1:] for number in range(len(terms))]
+        weights = [0] * len(terms)
+        best = []  # (score, order, key), the limit-th best on top
+        seen = set()
+        while len(best) < limit or best[0][0] < sum(weights):
+            for number, postings in enumerate(documents):
+                entry = next(postings, None)
+                if entry is None:
+                    return [(score, key) for score, _, key in sorted(best, reverse=True)]
+                
+                weights[number], key = entry
+                if key in seen:
+                    continue
+                seen.add(key)
+                # A document first comes up at its best weight for that term
+                score = self._score(key, others[number])
+                if score is None:
+                    continue
+                score += weights[number]
+                if len(best) < limit:
+                    heapq.heappush(best, (score, -len(seen), key))
+                elif score > best[0][0]:
+                    heapq.heapreplace(best, (score, -len(seen), key))
+        return [(score, key) for score, _, key in sorted(best, reverse=True)]
+
+    def search(self, words, limit):
+        """(score, key) of the documents matching every query word, best first (limit=None for all)"""
+        terms = [SearchTerm(self, word) for word in words]
+        if limit is not None:
+            return self._top(terms, limit)
+        
+        # Start from the term matching the fewest documents, then check the other
+        # terms against the words of the documents still in the running. Terms
+        # are counted up to a growing bound, so none is counted far past the fewest
+        if len(terms) > 1:
+            bound = 256
+            counts = {term: self._count(term, bound) for term in terms}
+            while min(counts.values()) > bound:
+                bound *= 16
+                counts = {term: self._count(term, bound) for term in terms}
+            terms.sort(key=counts.get)
+        first, rest = terms[0], terms[1:]
+        
+        scores = {}
+        for word in first.words():
+            for key in self.words[word]:
+                if key not in scores:
+                    scores[key] = first.weight(word)
+        
+        for term in rest:
+            scores = self._narrow(scores, term)
+        return sorted(((score, key) for key, score in scores.items()), key=lambda pair: pair[0], reverse=True)
+
+class SearchIndex:
+    """Word and trigram index over client, guest and property text for the global search
+
+    Every client, reservation (guest name and email) and property of a client is
+    a document, keyed ("client", client_id), ("reservation", reservation_id) or
+    ("property", client_id, property_name). Each kind of document has its own
+    WordIndex, so a query term matches words it is a prefix of or, failing
+    that, words within a small edit distance, and a search limited to some
+    kinds never looks at the others. Documents are added and dropped per client
+    as the data changes; the index is changed in place, so searches hold the
+    store's read lock.
+    """
+
+    KINDS = ("client", "reservation", "property")
+    CLIENT_FIELDS = ("name", "contact_person", "email")
+    GUEST_FIELDS = ("guest_name", "guest_email")
+
+    def __init__(self, clients):
+        self.rebuild(clients)
+
+    @staticmethod
+    def tokenize(text):
+        return re.findall(r"\w+", str(text or "").casefold())
+
+    def _add(self, key, owner, texts):
+        words = frozenset(word for text in texts for word in self.tokenize(text))
+        if not words:
+            return
+        
+        self.owned.setdefault(owner, set()).add(key)
+        self.kinds[key[0]].add(key, words)
+
+    def _remove(self, key):
+        self.kinds[key[0]].remove(key)
+
+    def rebuild(self, clients):
+        """Rebuild from scratch (after wholesale replacement of the data)"""
+        self.kinds = {kind: WordIndex() for kind in self.KINDS}
+        self.owned = {}
+        self.replace_clients(clients, list(clients))
+
+    def update_client(self, client):
+        """Reindex a client's own fields"""
+        self._remove(("client", client["id"]))
+        self._add(("client", client["id"]), client["id"], [client.get(field) for field in self.CLIENT_FIELDS])
+
+    def add_reservations(self, client_id, reservations):
+        properties = self.kinds["property"].documents
+        for reservation in reservations:
+            self._add(
+                ("reservation", reservation.get("id")), client_id,
+                [reservation.get(field) for field in self.GUEST_FIELDS]
+            )
+            property_key = ("property", client_id, str(reservation.get("property_name", "")))
+            if property_key not in properties:
+                self._add(property_key, client_id, [property_key[2]])
+
+    def drop_clients(self, client_ids):
+        """Remove every document of the given clients"""
+        for client_id in client_ids:
+            for key in self.owned.pop(client_id, ()):
+                self._remove(key)
+
+    def replace_clients(self, clients, client_ids):
+        """Reindex the given clients from their current records"""
+        self.drop_clients(client_ids)
+        for client_id in client_ids:
+            if client_id in clients:
+                self.update_client(clients[client_id])
+                self.add_reservations(client_id, clients[client_id].get("reservations", []))
+
+    def search(self, query, limit=20, kinds=None):
+        """Keys of documents matching every word of a query, best first
+
+        kinds limits the results to some document kinds; limit=None returns every match.
+        """
+        words = set(self.tokenize(query))
+        if not words:
+            return []
+        
+        ranked = []
+        for kind, index in self.kinds.items():
+            if kinds is None or kind in kinds:
+                ranked.extend(index.search(words, limit))
+        ranked.sort(key=lambda pair: pair[0], reverse=True)
+        return [key for _, key in ranked[:limit]]
+
+class ReservationIndexes:
+    """Secondary indexes over one reservation frame, with a small query planner
+
+    Each indexed field maps its values to the rows that hold them. For the
+    table's current frame these are the postings the table maintains (value to
+    reservation IDs, turned into rows through the ID index); for any other
+    frame a field's postings are built on first use. select() starts from the
+    smallest candidate set and checks the other filters on those rows only,
+    so a query costs about the size of its most selective filter.
+    """
+
+    FIELDS = ("client_id", "status", "property_name", "guest_email")
+
+    def __init__(self, frame, table=None):
+        self.frame = frame
+        self.table = table
+        self.postings = {}
+
+    @staticmethod
+    def key(field, value):
+        """Indexed form of a filter value (guest emails match case-insensitively)"""
+        if field == "guest_email":
+            return normalize_email(value)
+        return value
+
+    def _postings(self, field):
+        if self.table is not None:
+            return self.table.postings[field]
+        if field not in self.postings:
+            self.postings[field] = self.frame.groupby(field, observed=True, sort=False).indices
+        return self.postings[field]
+
+    def _positions(self, field, key):
+        """Rows whose field holds the indexed value key"""
+        postings = self._postings(field).get(key, ())
+        if self.table is not None:
+            index = self.table.index
+            return np.fromiter((index[reservation_id][3] for reservation_id in postings), dtype=np.int64, count=len(postings))
+        return np.asarray(postings, dtype=np.int64)
+
+    def _matches(self, field, value, positions):
+        """Mask over positions of the rows whose field equals value"""
+        column = self.frame[field]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            categories = column.cat.categories
+            if value not in categories:
+                return np.zeros(len(positions), dtype=bool)
+            return column.cat.codes.to_numpy()[positions] == categories.get_loc(value)
+        return column.to_numpy()[positions] == value
+
+    def select(self, candidates=None, **filters):
+        """Rows matching every field=value filter, limited to candidate rows if given, in frame order"""
+        sources = [
+            (len(postings), field)
+            for field, postings in (
+                (field, self._postings(field).get(self.key(field, value), ()))
+                for field, value in filters.items()
+            )
+        ]
+        if candidates is not None:
+            candidates = np.asarray(candidates, dtype=np.int64)
+            sources.append((len(candidates), None))
+        if not sources:
+            return self.frame
+        
+        size, start = min(sources, key=lambda source: source[0])
+        if size == 0:
+            return self.frame.iloc[[]]
+        
+        if start is None:
+            positions = candidates
+        else:
+            positions = self._positions(start, self.key(start, filters[start]))
+        
+        for field, value in filters.items():
+            if field != start:
+                positions = positions[self._matches(field, self.key(field, value), positions)]
+        if start is not None and candidates is not None:
+            positions = positions[np.isin(positions, candidates)]
+        
+        return self.frame.iloc[np.sort(positions)]
+
+class ReservationTotals:
+    """Running totals of the reservation table for the dashboard
+
+    Reservation counts per client, and check-ins and revenue per day, are
+    adjusted by the rows each change adds or removes, so the dashboard sums a
+    few daily buckets instead of scanning every reservation. Windows such as
+    month-to-date are summed from the buckets for the current date, so nothing
+    has to be reset when the day or the month rolls over. Revenue is the amount
+    of each reservation that is not cancelled, booked on its check-in day.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.by_client = {}
+        self.check_ins = {}
+        self.revenue = {}
+
+    @staticmethod
+    def _adjust(table, amounts, sign):
+        for key, amount in amounts.items():
+            value = round(table.get(key, 0) + sign * amount, 2)
+            if value:
+                table[key] = value
+            else:
+                table.pop(key, None)
+
+    def add(self, frame, sign=1):
+        """Add (or with sign -1, remove) the rows of a frame"""
+        self.count += sign * len(frame)
+        self._adjust(self.by_client, frame.groupby("client_id", observed=True, sort=False).size(), sign)
+        
+        dated = frame[frame["check_in"].notna()]
+        days = dated["check_in"].dt.normalize()
+        self._adjust(self.check_ins, dated.groupby(days, sort=False).size(), sign)
+        
+        billed = (dated["status"] != "Cancelled").to_numpy()
+        self._adjust(self.revenue, dated["amount"][billed].groupby(days[billed], sort=False).sum(), sign)
+
+    def _sum(self, table, start, end):
+        """Sum of daily buckets from start to end inclusive"""
+        return round(sum(table.get(day, 0) for day in pd.date_range(start, end)), 2)
+
+    def summary(self, today):
+        """Dashboard figures as of today
+
+        Month-to-date revenue is compared with the same days of the previous
+        month (up to its last day when it is shorter).
+        """
+        month_start = today.replace(day=1)
+        previous_start = month_start - pd.DateOffset(months=1)
+        previous_end = min(previous_start + (today - month_start), month_start - pd.Timedelta(days=1))
+        return {
+            "count": self.count,
+            "by_client": dict(self.by_client),
+            "upcoming_week": self._sum(self.check_ins, today, today + pd.Timedelta(days=7)),
+            "revenue_month": self._sum(self.revenue, month_start, today),
+            "revenue_previous_month": self._sum(self.revenue, previous_start, previous_end)
+        }
+
+class ReservationTable:
+    """Columnar copy of every reservation, kept next to the client records
+
+    Dates are datetime64 columns (NaT when missing or unparsable) and status and
+    property are categoricals, so filters and aggregates run as vectorized masks.
+    The record column holds the reservation dict itself for display. Adding or
+    removing rows builds a new frame, so readers can keep using the one they
+    took; an update rewrites its one row in place.
+
+    The index maps each reservation ID to (client_id, record, position in the
+    client's list, frame row), so a single reservation is found without
+    scanning. Interval indexes for date-range queries are built on first use for
+    each frame. The postings map each client, status, property and guest email
+    to its reservation IDs for field filters, the property calendar tracks
+    booked nights for overbooking checks, and the totals keep the dashboard
+    figures; all three are updated with every change rather than rebuilt.
+    """
+
+    CATEGORY_COLUMNS = ("client_id", "property_name", "status")
+
+    def __init__(self, clients):
+        self._frame_cache = (None, {})
+        self.rebuild(clients)
+
+    def _post(self, frame, sign=1):
+        """Add (or with sign -1, remove) the IDs of frame rows to the secondary index postings"""
+        ids = frame["id"].to_numpy()
+        for field in ReservationIndexes.FIELDS:
+            postings = self.postings[field]
+            for value, positions in frame.groupby(field, observed=True, sort=False).indices.items():
+                reservation_ids = [reservation_id for reservation_id in ids[positions] if reservation_id is not None]
+                if sign > 0:
+                    postings.setdefault(value, set()).update(reservation_ids)
+                else:
+                    postings[value].difference_update(reservation_ids)
+                    if not postings[value]:
+                        del postings[value]
+
+    @staticmethod
+    def _build(clients, client_ids=None):
+        """Frame for the reservations of the given clients (all of them by default)"""
+        rows = [
+            (client_id, reservation)
+            for client_id, client in clients.items()
+            if client_ids is None or client_id in client_ids
+            for reservation in client.get("reservations", [])
+        ]
+        return ReservationTable._frame(rows)
+
+    @staticmethod
+    def _frame(rows):
+        """Frame for (client_id, reservation) pairs"""
+        records = [reservation for _, reservation in rows]
+        return ReservationTable._assemble([client_id for client_id, _ in rows], records, {
+            "id": [record.get("id") for record in records],
+            "property_name": [str(record.get("property_name", "")) for record in records],
+            "status": [str(record.get("status", "Active")) for record in records],
+            "check_in": pd.to_datetime(
+                pd.Series([record.get("check_in_date") for record in records], dtype=object),
+                format="%Y-%m-%d", errors="coerce"
+            ),
+            "check_out": pd.to_datetime(
+                pd.Series([record.get("check_out_date") for record in records], dtype=object),
+                format="%Y-%m-%d", errors="coerce"
+            ),
+            "created_at": pd.to_datetime(
+                pd.Series([record.get("created_at") for record in records], dtype=object),
+                format="%Y-%m-%d %H:%M:%S", errors="coerce"
+            ),
+            "guest_email": [normalize_email(record.get("guest_email")) for record in records],
+            "num_guests": pd.to_numeric(
+                pd.Series([record.get("num_guests", 0) for record in records], dtype=object), errors="coerce"
+            ).fillna(0).astype("int64"),
+            "amount": pd.to_numeric(
+                pd.Series([record.get("amount", 0) for record in records], dtype=object), errors="coerce"
+            ).fillna(0.0).astype("float64")
+        })
+
+    @staticmethod
+    def _assemble(client_ids, records, columns):
+        """Frame for the records of the given clients, from columns already in frame types
+
+        Import batches are validated column by column and come in here without
+        going back through the records.
+        """
+        def values(column):
+            return column.to_numpy() if isinstance(column, pd.Series) else column
+        
+        return pd.DataFrame({
+            "id": pd.Series(values(columns["id"]), dtype=object),
+            "client_id": pd.Categorical(client_ids),
+            "property_name": pd.Categorical(values(columns["property_name"])),
+            "status": pd.Categorical(values(columns["status"])),
+            "check_in": values(columns["check_in"]),
+            "check_out": values(columns["check_out"]),
+            "created_at": values(columns["created_at"]),
+            "guest_email": pd.Series(values(columns["guest_email"]), dtype=object),
+            "num_guests": values(columns["num_guests"]),
+            "amount": values(columns["amount"]),
+            "record": pd.Series(records, dtype=object)
+        })
+
+    @classmethod
+    def _concat(cls, frames):
+        """Concatenate frames, keeping the categorical columns categorical"""
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return cls._frame([])
+        if len(frames) == 1:
+            return frames[0]
+        
+        frames = [frame.copy() for frame in frames]
+        for column in cls.CATEGORY_COLUMNS:
+            categories = pd.api.types.union_categoricals([frame[column] for frame in frames]).categories
+            for frame in frames:
+                frame[column] = frame[column].cat.set_categories(categories)
+        return pd.concat(frames, ignore_index=True)
+
+    def _index_client(self, client_id, reservations, start, first_row):
+        """Add a client's reservations to the index, from list position start and frame row first_row"""
+        for offset, reservation in enumerate(reservations):
+            if reservation.get("id") is not None:
+                self.index[reservation["id"]] = (client_id, reservation, start + offset, first_row + offset)
+            else:
+                self.unindexed += 1
+
+    def _index_rows(self, first_row=0):
+        """Record the frame row of every indexed reservation from first_row on (after rows moved)"""
+        for row, reservation_id in enumerate(self.frame["id"].iloc[first_row:].tolist(), first_row):
+            entry = self.index.get(reservation_id)
+            if entry is not None:
+                self.index[reservation_id] = (*entry[:3], row)
+
+    def get(self, reservation_id):
+        """(client_id, record, position, frame row) for a reservation ID, or None"""
+        return self.index.get(reservation_id)
+
+    def _count_properties(self, frame, sign=1):
+        """Add (or with sign -1, remove) the property names of frame rows to the value tables"""
+        counts = frame.groupby(["client_id", "property_name"], observed=True, sort=False).size()
+        for (client_id, property_name), count in counts.items():
+            table = self.client_properties.setdefault(client_id, ValueTable())
+            if sign > 0:
+                table.add(property_name, count)
+                self.properties.add(property_name, count)
+            else:
+                table.remove(property_name, count)
+                self.properties.remove(property_name, count)
+                if not table.counts:
+                    del self.client_properties[client_id]
+
+    def property_names(self, client_id=None):
+        """Property names in use, by one client or by all"""
+        if client_id is None:
+            return self.properties.values()
+        return self.client_properties.get(client_id, ValueTable()).values()
+
+    def _cached(self, frame, key, build):
+        """Structure derived from a frame taken from this table, built once per frame"""
+        cached_frame, cache = self._frame_cache
+        if cached_frame is not frame:
+            if frame is not self.frame:
+                # A session still on an older frame gets a throwaway copy
+                return build()
+            cache = {}
+            self._frame_cache = (frame, cache)
+        
+        if key not in cache:
+            cache[key] = build()
+        return cache[key]
+
+    def intervals(self, frame, client_id=None):
+        """Interval index over a frame taken from this table, for one client or all"""
+        return self._cached(frame, ("intervals", client_id), lambda: ReservationIntervals(frame, client_id))
+
+    def indexes(self, frame):
+        """Secondary indexes over a frame taken from this table
+
+        The current frame uses the maintained postings (call with the store's
+        read lock held); older frames, and frames with rows the ID index cannot
+        place, get postings built for them.
+        """
+        if frame is self.frame and not self.unindexed:
+            return ReservationIndexes(frame, self)
+        return self._cached(frame, ("indexes",), lambda: ReservationIndexes(frame))
+
+    def rebuild(self, clients):
+        """Rebuild from scratch (after wholesale replacement of the data)"""
+        self.frame = self._build(clients)
+        self.index = {}
+        self.unindexed = 0
+        row = 0
+        for client_id, client in clients.items():
+            self._index_client(client_id, client.get("reservations", []), 0, row)
+            row += len(client.get("reservations", []))
+        
+        self.calendar = PropertyCalendar()
+        self.calendar.add(self.frame)
+        
+        self.properties = ValueTable()
+        self.client_properties = {}
+        self._count_properties(self.frame)
+        
+        self.totals = ReservationTotals()
+        self.totals.add(self.frame)
+        
+        self.postings = {field: {} for field in ReservationIndexes.FIELDS}
+        self._post(self.frame)
+
+    def append(self, client_id, reservations, start, frame=None):
+        """Add rows for new reservations of a client, the first at list position start
+
+        frame may hold the rows already built for these reservations.
+        """
+        if frame is None:
+            frame = self._frame([(client_id, reservation) for reservation in reservations])
+        
+        first_row = len(self.frame)
+        self.frame = self._concat([self.frame, frame])
+        self._index_client(client_id, reservations, start, first_row)
+        self.calendar.add(frame)
+        self._count_properties(frame)
+        self.totals.add(frame)
+        self._post(frame)
+
+    def drop_clients(self, client_ids):
+        """Remove every row of the given clients"""
+        dropped = self.frame["client_id"].isin(list(client_ids))
+        dropped_ids = self.frame.loc[dropped, "id"].tolist()
+        for reservation_id in dropped_ids:
+            self.index.pop(reservation_id, None)
+        self.calendar.remove(dropped_ids)
+        self._count_properties(self.frame[dropped], -1)
+        self.totals.add(self.frame[dropped], -1)
+        self._post(self.frame[dropped], -1)
+        self.unindexed -= dropped_ids.count(None)
+        
+        frame = self.frame[~dropped].reset_index(drop=True)
+        frame["client_id"] = frame["client_id"].cat.remove_unused_categories()
+        self.frame = frame
+        
+        # Rows after the first dropped one have moved up
+        if dropped_ids:
+            self._index_rows(int(np.argmax(dropped.to_numpy())))
+
+    def replace_clients(self, clients, client_ids):
+        """Reload the rows of the given clients from their current records"""
+        self.drop_clients(client_ids)
+        client_ids = set(client_ids)
+        added = self._build(clients, client_ids)
+        row = len(self.frame)
+        self.frame = self._concat([self.frame, added])
+        self.calendar.add(added)
+        self._count_properties(added)
+        self.totals.add(added)
+        self._post(added)
+        
+        # Same client order as _build, so rows follow on
+        for client_id, client in clients.items():
+            if client_id in client_ids:
+                self._index_client(client_id, client.get("reservations", []), 0, row)
+                row += len(client.get("reservations", []))
+
+    def update(self, reservation):
+        """Refresh the row of a reservation whose record was replaced
+
+        Only that row is written, in place, the way a client's reservation list
+        swaps one record for another; the frame keeps its shape and its caches.
+        """
+        client_id, _, position, row = self.index[reservation["id"]]
+        self.index[reservation["id"]] = (client_id, reservation, position, row)
+        new = self._frame([(client_id, reservation)])
+        self.calendar.remove([reservation["id"]])
+        self.calendar.add(new)
+        
+        old = self.frame.iloc[[row]]
+        status = str(reservation.get("status", "Active"))
+        if status not in self.frame["status"].cat.categories:
+            self.frame["status"] = self.frame["status"].cat.add_categories([status])
+        
+        self.frame.iat[row, self.frame.columns.get_loc("status")] = status
+        self.frame.iat[row, self.frame.columns.get_loc("record")] = reservation
+        self.totals.add(old, -1)
+        self.totals.add(new)
+        self._post(old, -1)
+        self._post(new)
+        
+        # Postings built for this frame (when it has rows without IDs) are out of date
+        self._frame_cache[1].pop(("indexes",), None)
+
+class DataStore:
+    """Authoritative copy of clients, users and logs, plus its GitHub sync state
+
+    Changes go through the data access helpers, which hold the write lock. Dicts
+    that pages iterate are never resized in place: adding or removing a client or
+    user swaps in a new dict and a changed record replaces the old object, so a
+    session can keep reading the containers it bound at the start of its run.
+    """
+
+    def __init__(self):
+        self.lock = ReadWriteLock()
+        self.dirty_shards = set()
+        self.clients = db_load_clients()
+        self.users = db_load_users()
+        self.activity_log = db_load_activity_log()
+        self.activity_archive = db_load_archive_index()
+        self.import_history = db_load_history("import_history")
+        self.export_history = db_load_history("export_history")
+        self._migrate_dates()
+        self.archive_activity()
+        self.reservations = ReservationTable(self.clients)
+        self.search = SearchIndex(self.clients)
+        self.github_synced = False
+        self.github_loaded_sha = None
+
+    @property
+    def clients(self):
+        return self._clients
+
+    @clients.setter
+    def clients(self, clients):
+        """Swap in a new clients dict and rebuild its service type table"""
+        self._clients = clients
+        self.service_types = ValueTable(client.get("service_type", "") for client in clients.values())
+
+    @property
+    def activity_log(self):
+        return self._activity_log
+
+    @activity_log.setter
+    def activity_log(self, entries):
+        """Swap in a new activity log, put in time order, and rebuild its index"""
+        self._activity_log = sorted(entries, key=lambda entry: str(entry.get("timestamp", "")))
+        self.activity_index = LogIndex(ACTIVITY_INDEX_FIELDS, self._activity_log)
+
+    def _index_archive(self, segments, deleted=()):
+        """Add segment metadata to the archive index (and drop deleted names)"""
+        archive = {segment["name"]: segment for segment in self.activity_archive if segment["name"] not in deleted}
+        archive.update((segment["name"], segment) for segment in segments)
+        self.activity_archive = sorted(archive.values(), key=lambda segment: segment["first_timestamp"])
+
+    def archive_activity(self):
+        """Move the oldest activity entries into compressed archive segments
+
+        The log keeps ACTIVITY_LOG_HOT_LIMIT entries plus at most one segment's
+        worth; beyond that whole segments are archived and the log is swapped
+        for its newer part. Archived segments go to their own shards, so the
+        activity log shard only carries the recent entries.
+        """
+        overflow = len(self.activity_log) - ACTIVITY_LOG_HOT_LIMIT
+        overflow -= overflow % ACTIVITY_ARCHIVE_SEGMENT_SIZE
+        if overflow <= 0:
+            return
+        
+        segments = [
+            archive_segment(self.activity_log[start:start + ACTIVITY_ARCHIVE_SEGMENT_SIZE])
+            for start in range(0, overflow, ACTIVITY_ARCHIVE_SEGMENT_SIZE)
+        ]
+        db_archive_activity(overflow, segments)
+        self.activity_log = self.activity_log[overflow:]
+        self._index_archive([segment for segment, _ in segments])
+        self.dirty_shards.update(["activity_log", *(archive_shard_path(segment["name"]) for segment, _ in segments)])
+
+    def replace_archive_segments(self, segments):
+        """Store archive segments loaded from GitHub, given as {name: entries, or None to delete}"""
+        loaded = [archive_segment(entries, name) for name, entries in segments.items() if entries is not None]
+        deleted = [name for name, entries in segments.items() if entries is None]
+        db_save_archive_segments(loaded)
+        db_delete_archive_segments(deleted)
+        self._index_archive([segment for segment, _ in loaded], set(deleted))
+
+    def _migrate_dates(self):
+        """Rewrite dates stored before ingest normalization (e.g. Excel timestamps) in canonical form"""
+        data = {field: getattr(self, field) for field in DATA_STORE_FIELDS}
+        normalized = normalize_dates(data)
+        if normalized != data:
+            normalized["clients"] = compact_clients(normalized["clients"])
+            for field in DATA_STORE_FIELDS:
+                setattr(self, field, normalized[field])
+            db_replace_all(normalized)
+
+@st.cache_resource
+def get_data_store():
+    """Process-wide data store, loaded from the local database on first use"""
+    store = DataStore()
+
+    if not store.clients:
+        # Add sample client - Dajo Curacao (first run against an empty database)
+        store.clients = {"dajo-curacao": Client({
+            "id": "dajo-curacao",
+            "name": "Dajo Curacao",
+            "contact_person": "John Doe",
+            "email": "contact@dajocuracao.com",
+            "phone": "+123456789",
+            "address": "Willemstad, Curacao",
+            "service_type": "Property Management",
+            "notes": "Vacation rental properties",
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "reservations": []
+        })}
+        store.search.update_client(store.clients["dajo-curacao"])
+        db_save_client(store.clients["dajo-curacao"])
+
+    if not store.users:
+        # Create some default users on first run
+        # Format: username: {password_hash, role, name, email}
+        store.users = {
+            "admin": {
+                "password_hash": hashlib.sha256("admin123".encode()).hexdigest(),
+                "role": "admin",
+                "name": "Admin User",
+                "email": "admin@videmiservices.com"
+            },
+            "manager": {
+                "password_hash": hashlib.sha256("manager123".encode()).hexdigest(),
+                "role": "manager",
+                "name": "Manager User",
+                "email": "manager@videmiservices.com"
+            },
+            "staff": {
+                "password_hash": hashlib.sha256("staff123".encode()).hexdigest(),
+                "role": "staff",
+                "name": "Staff User",
+                "email": "staff@videmiservices.com"
+            }
+        }
+
+        for username, user in store.users.items():
+            db_save_user(username, user)
+
+    return store
+
+def bind_session_to_store():
+    """Point this session's data at the current containers of the shared store"""
+    store = get_data_store()
+    with store.lock.read():
+        for field in DATA_STORE_FIELDS:
+            st.session_state[field] = getattr(store, field)
+        st.session_state.reservation_table = store.reservations.frame
+
+@contextmanager
+def store_write():
+    """Hold the shared store's write lock, then rebind this session to the result"""
+    store = get_data_store()
+    with store.lock.write():
+        yield store
+    bind_session_to_store()
+
+# Session notifications: the newest are kept, and the sidebar shows them a page at a time
+NOTIFICATION_LIMIT = 100
+NOTIFICATIONS_PER_PAGE = 5
+
+class NotificationQueue:
+    """A session's most recent notifications, with a running unread count
+
+    Adding a notification beyond the limit drops the oldest. Notifications are
+    numbered in order, and marking all read only records the newest number,
+    so it costs the same however many notifications there are.
+    """
+
+    def __init__(self, limit=NOTIFICATION_LIMIT):
+        self.items = deque(maxlen=limit)
+        self.next_number = 0
+        self.read_through = -1  # Notifications numbered up to this one are read
+        self.unread = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def is_read(self, notification):
+        return notification["read"] or notification["number"] <= self.read_through
+
+    def add(self, notification):
+        if len(self.items) == self.items.maxlen and not self.is_read(self.items[0]):
+            self.unread -= 1
+        
+        notification["number"] = self.next_number
+        self.next_number += 1
+        self.items.append(notification)
+        if not self.is_read(notification):
+            self.unread += 1
+
+    def mark_read(self, number):
+        """Mark the notification with this number read (if it is still kept)"""
+        position = number - self.items[0]["number"] if self.items else -1
+        if 0 <= position < len(self.items) and not self.is_read(self.items[position]):
+            self.items[position]["read"] = True
+            self.unread -= 1
+
+    def mark_all_read(self):
+        self.read_through = self.next_number - 1
+        self.unread = 0
+
+    def clear(self):
+        self.items.clear()
+        self.unread = 0
+
+    def page_count(self, size=NOTIFICATIONS_PER_PAGE):
+        return max(1, -(-len(self.items) // size))
+
+    def page(self, number, size=NOTIFICATIONS_PER_PAGE):
+        """Notifications on a page, newest first (page 0 holds the newest)"""
+        end = len(self.items) - number * size
+        return [self.items[position] for position in range(end - 1, max(end - size, 0) - 1, -1)]
+
+# Initialize session state variables
+bind_session_to_store()
 
 if 'current_client' not in st.session_state:
     st.session_state.current_client = None
@@ -58,110 +2068,847 @@ if 'authenticated' not in st.session_state:
 if 'active_tab' not in st.session_state:
     st.session_state.active_tab = "dashboard"
 
-if 'users' not in st.session_state:
-    # Create some default users (in a real app, this would be in a database)
-    # Format: username: {password_hash, role, name, email}
-    st.session_state.users = {
-        "admin": {
-            "password_hash": hashlib.sha256("admin123".encode()).hexdigest(),
-            "role": "admin",
-            "name": "Admin User",
-            "email": "admin@videmiservices.com"
-        },
-        "manager": {
-            "password_hash": hashlib.sha256("manager123".encode()).hexdigest(),
-            "role": "manager",
-            "name": "Manager User",
-            "email": "manager@videmiservices.com"
-        },
-        "staff": {
-            "password_hash": hashlib.sha256("staff123".encode()).hexdigest(),
-            "role": "staff",
-            "name": "Staff User",
-            "email": "staff@videmiservices.com"
-        }
+if 'current_user' not in st.session_state:
+    st.session_state.current_user = None
+
+if 'github_token' not in st.session_state:
+    st.session_state.github_token = None
+
+if 'github_repo' not in st.session_state:
+    st.session_state.github_repo = None
+
+if 'imported_data' not in st.session_state:
+    st.session_state.imported_data = None
+
+if 'notifications' not in st.session_state:
+    st.session_state.notifications = NotificationQueue()
+
+# Helper functions
+def log_activity(activity_type, description, user=None, mark_changed=True, client_id=None):
+    """Log user activity, optionally about one client
+
+    Entries about persistence itself pass mark_changed=False, so they ride along with
+    the next real change instead of making the activity log shard dirty on their own.
+    """
+    if user is None and st.session_state.current_user:
+        user = st.session_state.current_user
+    
+    entry = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "user": user,
+        "type": activity_type,
+        "description": description
     }
+    if client_id is not None:
+        entry["client_id"] = client_id
+    
+    with store_write() as store:
+        store.activity_log.append(entry)
+        store.activity_index.add(entry)
+        db_add_activity(entry)
+        if mark_changed:
+            mark_dirty("activity_log")
+        store.archive_activity()
+
+def add_notification(message, type="info"):
+    """Add a notification to the session state"""
+    st.session_state.notifications.add({
+        "message": message,
+        "type": type,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "read": False
+    })
+
+# Data access helpers (shared store + row-level storage)
+def add_client(client):
+    """Add a new client"""
+    add_clients([client])
+
+def add_clients(clients):
+    """Add several new clients"""
+    clients = [compact_client(client) for client in clients]
+    
+    with store_write() as store:
+        store.clients = {**store.clients, **{client["id"]: client for client in clients}}
+        store.reservations.replace_clients(store.clients, [client["id"] for client in clients])
+        store.search.replace_clients(store.clients, [client["id"] for client in clients])
+        for client in clients:
+            db_save_client(client)
+        mark_dirty(*[client_shard_path(client["id"]) for client in clients])
+
+def update_client(client_id, updates):
+    """Apply changes to a client's information"""
+    with store_write() as store:
+        client = Client({**store.clients[client_id], **updates})
+        store.service_types.remove(store.clients[client_id].get("service_type", ""))
+        store.service_types.add(client.get("service_type", ""))
+        store.clients[client_id] = client
+        store.search.update_client(client)
+        db_save_client(client)
+        mark_dirty(client_shard_path(client_id))
+
+def delete_client(client_id):
+    """Delete a client together with its reservations"""
+    with store_write() as store:
+        store.clients = {key: client for key, client in store.clients.items() if key != client_id}
+        store.reservations.drop_clients([client_id])
+        store.search.drop_clients([client_id])
+        db_delete_client(client_id)
+        mark_dirty(client_shard_path(client_id))
+
+def add_reservations(client_id, reservations, batch=None):
+    """Append reservations to a client, leaving out any that would overbook a property
+
+    batch is their reservation frame when the caller has built it already (imports).
+    Returns (reservation, conflicting reservation IDs) for each one left out.
+    """
+    reservations = [compact_reservation(reservation) for reservation in reservations]
+    
+    with store_write() as store:
+        if batch is None:
+            batch = ReservationTable._frame([(client_id, reservation) for reservation in reservations])
+        overbooked = dict(store.reservations.calendar.sweep(batch))
+        rejected = [(reservations[position], conflicts) for position, conflicts in overbooked.items()]
+        if rejected:
+            keep = [position for position in range(len(reservations)) if position not in overbooked]
+            reservations = [reservations[position] for position in keep]
+            batch = batch.iloc[keep].reset_index(drop=True)
+        
+        if reservations:
+            client = store.clients[client_id]
+            if "reservations" not in client:
+                client = store.clients[client_id] = Client({**client, "reservations": []})
+            
+            start = len(client["reservations"])
+            client["reservations"].extend(reservations)
+            store.reservations.append(client_id, reservations, start, batch)
+            store.search.add_reservations(client_id, reservations)
+            db_save_reservations(client_id, reservations)
+            mark_dirty(client_shard_path(client_id))
+    
+    return rejected
+
+def add_reservation(client_id, reservation):
+    """Append a single reservation to a client; returns the IDs it would overbook against (empty if added)"""
+    rejected = add_reservations(client_id, [reservation])
+    return rejected[0][1] if rejected else []
+
+def get_reservation(reservation_id):
+    """(client_id, reservation) for a reservation ID, or None if not found"""
+    entry = get_data_store().reservations.get(reservation_id)
+    return entry[:2] if entry else None
+
+def describe_reservation(reservation_id):
+    """Short description of a reservation for messages"""
+    entry = get_reservation(reservation_id)
+    if entry is None:
+        return str(reservation_id)
+    
+    reservation = entry[1]
+    return (
+        f"{reservation.get('guest_name') or 'Unknown Guest'} at {reservation.get('property_name', '')} "
+        f"({reservation.get('check_in_date', '')} to {reservation.get('check_out_date', '')})"
+    )
+
+def cancel_reservation(reservation_id):
+    """Mark a reservation as cancelled and return it (None if not found)"""
+    with store_write() as store:
+        entry = store.reservations.get(reservation_id)
+        if entry is None:
+            return None
+        
+        client_id, reservation, position, _ = entry
+        reservation = store.clients[client_id]["reservations"][position] = Reservation({
+            **reservation,
+            "status": "Cancelled",
+            "cancelled_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "cancelled_by": st.session_state.current_user
+        })
+        store.reservations.update(reservation)
+        db_save_reservations(client_id, [reservation])
+        mark_dirty(client_shard_path(client_id))
+        return reservation
+
+def clear_reservations():
+    """Remove every reservation from every client"""
+    with store_write() as store:
+        for client_id, client in store.clients.items():
+            store.clients[client_id] = Client({**client, "reservations": []})
+            mark_dirty(client_shard_path(client_id))
+        
+        store.reservations.rebuild(store.clients)
+        store.search.rebuild(store.clients)
+        db_clear_reservations()
+
+def clear_clients():
+    """Remove every client"""
+    with store_write() as store:
+        previous_client_ids = list(store.clients)
+        store.clients = {}
+        store.reservations.rebuild(store.clients)
+        store.search.rebuild(store.clients)
+        db_clear_clients()
+        mark_dirty(*[client_shard_path(client_id) for client_id in previous_client_ids])
+
+def clear_activity_log():
+    """Remove every activity log entry, archived ones included"""
+    with store_write() as store:
+        names = [segment["name"] for segment in store.activity_archive]
+        store.activity_log = []
+        store.activity_archive = []
+        db_clear_activity_log()
+        db_delete_archive_segments(names)
+        mark_dirty("activity_log", *[archive_shard_path(name) for name in names])
+
+def save_user(username, user):
+    """Add or update a user"""
+    with store_write() as store:
+        store.users = {**store.users, username: user}
+        db_save_user(username, user)
+        mark_dirty("users")
+
+def delete_user(username):
+    """Delete a user"""
+    with store_write() as store:
+        store.users = {key: user for key, user in store.users.items() if key != username}
+        db_delete_user(username)
+        mark_dirty("users")
+
+def record_import(entry):
+    """Append an entry to the import history"""
+    with store_write() as store:
+        store.import_history.append(entry)
+        db_add_history("import_history", entry)
+        mark_dirty("import_history")
+
+def record_export(entry):
+    """Append an entry to the export history"""
+    with store_write() as store:
+        store.export_history.append(entry)
+        db_add_history("export_history", entry)
+        mark_dirty("export_history")
+
+def replace_all_data(data):
+    """Replace clients, users and logs wholesale (GitHub load, backup restore, clear all)"""
+    with store_write() as store:
+        previous_client_ids = list(store.clients)
+        store.clients = compact_clients(data.get("clients", {}))
+        store.users = data.get("users") or store.users
+        store.activity_log = data.get("activity_log", [])
+        store.import_history = data.get("import_history", [])
+        store.export_history = data.get("export_history", [])
+        store.reservations.rebuild(store.clients)
+        store.search.rebuild(store.clients)
+        
+        db_replace_all({field: getattr(store, field) for field in DATA_STORE_FIELDS})
+        
+        # Archive segments the incoming data does not list belong to the replaced log
+        archive = data.get("activity_archive") or {}
+        dropped = [segment["name"] for segment in store.activity_archive if segment["name"] not in archive]
+        store.replace_archive_segments({**dict.fromkeys(dropped), **archive})
+        store.archive_activity()
+        mark_all_dirty(previous_client_ids)
+        mark_dirty(*[archive_shard_path(name) for name in dropped])
+
+def apply_shard_changes(shards):
+    """Apply shards loaded from GitHub on top of the current data (None deletes a client shard)
+
+    Shards that are not part of the change keep their data, including unsaved changes.
+    """
+    with store_write() as store:
+        client_ids_by_path = {client_shard_path(client_id): client_id for client_id in store.clients}
+        clients = dict(store.clients)
+        changes = {"clients": {}}
+        archived = {}
+        
+        for shard, data in shards.items():
+            if shard in GITHUB_SINGLETON_SHARDS:
+                # An empty user list is ignored, as in replace_all_data
+                if data is not None and (data or shard != "users"):
+                    setattr(store, shard, data)
+                    changes[shard] = getattr(store, shard)
+            elif shard.startswith(f"{GITHUB_ARCHIVE_DIR}/"):
+                archived[shard[len(GITHUB_ARCHIVE_DIR) + 1:]] = data
+            elif data is not None:
+                client = compact_client(data)
+                clients[client["id"]] = client
+                changes["clients"][client["id"]] = client
+            elif shard in client_ids_by_path:
+                del clients[client_ids_by_path[shard]]
+                changes["clients"][client_ids_by_path[shard]] = None
+        
+        store.clients = clients
+        store.reservations.replace_clients(clients, list(changes["clients"]))
+        store.search.replace_clients(clients, list(changes["clients"]))
+        db_apply_changes(changes)
+        store.replace_archive_segments(archived)
+        store.archive_activity()
+
+def client_shard_path(client_id):
+    """Name of a client's shard inside the GitHub data directory"""
+    return f"clients/{quote(client_id, safe='')}"
+
+def mark_dirty(*shards):
+    """Record changed shards so the next save uploads them"""
+    store = get_data_store()
+    with store.lock.write():
+        store.dirty_shards.update(shards)
+
+def mark_all_dirty(previous_client_ids=()):
+    """Mark every shard dirty, including clients that no longer exist (so they get deleted)"""
+    store = get_data_store()
+    with store.lock.write():
+        mark_dirty(*GITHUB_SINGLETON_SHARDS)
+        mark_dirty(*[archive_shard_path(segment["name"]) for segment in store.activity_archive])
+        mark_dirty(*[client_shard_path(client_id) for client_id in store.clients])
+        mark_dirty(*[client_shard_path(client_id) for client_id in previous_client_ids])
+
+def build_shard(shard, client_ids_by_path):
+    """Return the data stored in a shard, or None if the shard should be deleted"""
+    store = get_data_store()
+    if shard in GITHUB_SINGLETON_SHARDS:
+        return getattr(store, shard)
+
+    if shard.startswith(f"{GITHUB_ARCHIVE_DIR}/"):
+        return db_load_archive_segment(shard[len(GITHUB_ARCHIVE_DIR) + 1:])
+
+    client_id = client_ids_by_path.get(shard)
+    if client_id is None:
+        return None
+
+    return store.clients[client_id]
+
+def git_blob_sha(content):
+    """SHA-1 that git assigns to a blob with these bytes"""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+class GithubConnection:
+    """Pooled PyGithub client and repository handle for one (token, repository) pair
+
+    Remembers the ETag of the branch ref, the tree of the last seen commit and
+    recently seen blobs, so loading an unchanged snapshot costs one 304 response.
+    """
+
+    def __init__(self, token, repo_name):
+        self.client = Github(
+            auth=Auth.Token(token),
+            base_url=GITHUB_API_URL,
+            pool_size=GITHUB_POOL_SIZE,
+            seconds_between_requests=None,
+            lazy=True
+        )
+        self.repo = self.client.get_repo(repo_name)
+        self.head_sha = None
+        self.persisted_blob_shas = {}
+        self._head_etag = None
+        self._tree = (None, {})
+        self._blobs = OrderedDict()
+        self._blob_bytes = 0
+        self._lock = threading.Lock()
+
+    def get_head_sha(self):
+        """Return the branch head commit SHA, using a conditional request on the ref"""
+        headers = {"If-None-Match": self._head_etag} if self._head_etag else {}
+        response_headers, data = self.client.requester.requestJsonAndCheck(
+            "GET",
+            f"{self.repo.url}/git/ref/heads/{self.repo.default_branch}",
+            headers=headers
+        )
+        
+        # A 304 response has no body: the ref has not moved
+        if data is not None:
+            with self._lock:
+                self.head_sha = data["object"]["sha"]
+                self._head_etag = response_headers.get("etag")
+        
+        return self.head_sha
+
+    def set_head_sha(self, sha):
+        """Record a commit made through this connection"""
+        with self._lock:
+            self.head_sha = sha
+            self._head_etag = None
+
+    def get_tree_paths(self, commit_sha):
+        """Map every file path in a commit to its blob SHA"""
+        if self._tree[0] == commit_sha:
+            return self._tree[1]
+        
+        commit = self.repo.get_git_commit(commit_sha)
+        tree = self.repo.get_git_tree(commit.tree.sha, recursive=True)
+        paths = {element.path: element.sha for element in tree.tree if element.type == "blob"}
+        self._tree = (commit_sha, paths)
+        return paths
+
+    def is_persisted(self, path, content):
+        """True if content is byte-identical to the version of path this process last loaded or wrote"""
+        return self.persisted_blob_shas.get(path) == git_blob_sha(content)
+
+    def get_blob(self, sha):
+        """Return the raw bytes of a blob, from the cache when possible"""
+        with self._lock:
+            if sha in self._blobs:
+                self._blobs.move_to_end(sha)
+                return self._blobs[sha]
+        
+        blob = self.repo.get_git_blob(sha)
+        content = base64.b64decode(blob.content)
+        self.remember_blob(sha, content)
+        return content
+
+    def remember_blob(self, sha, content):
+        """Cache blob bytes (blobs are immutable, so the SHA is a permanent key)"""
+        with self._lock:
+            if sha in self._blobs:
+                return
+            
+            self._blobs[sha] = content
+            self._blob_bytes += len(content)
+            
+            while self._blob_bytes > GITHUB_BLOB_CACHE_BYTES and len(self._blobs) > 1:
+                _, evicted = self._blobs.popitem(last=False)
+                self._blob_bytes -= len(evicted)
+
+@st.cache_resource
+def get_github_connection(token, repo_name):
+    """Process-wide GitHub connection shared by every session using this token and repository"""
+    return GithubConnection(token, repo_name)
+
+def _merge_record(base, ours, theirs):
+    """Three-way merge of one record (None when absent); returns (record, conflicted)"""
+    if ours == theirs or theirs == base:
+        return ours, False
+    if ours == base:
+        return theirs, False
+    return ours, True
+
+def _merge_keyed(base, ours, theirs):
+    """Three-way merge of records keyed by id; returns (merged dict, conflicting keys)"""
+    merged = {}
+    conflicts = []
+    for key in [*theirs, *(key for key in ours if key not in theirs)]:
+        record, conflicted = _merge_record(base.get(key), ours.get(key), theirs.get(key))
+        if conflicted:
+            conflicts.append(key)
+        if record is not None:
+            merged[key] = record
+    return merged, conflicts
+
+def _record_key(record):
+    return json.dumps(record, sort_keys=True, default=json_default)
+
+def _merge_log(base, ours, theirs):
+    """Merge append-only logs: keep remote entries not removed here and add the new local ones"""
+    base_keys = {_record_key(entry) for entry in base}
+    our_keys = {_record_key(entry) for entry in ours}
+    their_keys = {_record_key(entry) for entry in theirs}
+    
+    kept = [entry for entry in theirs if _record_key(entry) not in base_keys or _record_key(entry) in our_keys]
+    added = [entry for entry in ours if _record_key(entry) not in base_keys and _record_key(entry) not in their_keys]
+    return sorted(kept + added, key=lambda entry: str(entry.get("timestamp", "")))
+
+def _split_client(client):
+    """Separate a client shard into its own fields and its reservations keyed by id"""
+    info = {key: value for key, value in client.items() if key != "reservations"}
+    reservations = {
+        reservation.get("id") or _record_key(reservation): reservation
+        for reservation in client.get("reservations", [])
+    }
+    return info, reservations
+
+def merge_shard(shard, base, ours, theirs):
+    """Three-way merge of one shard against the version both sides started from
+
+    Users merge per username, clients per client record and per reservation id,
+    and logs as append-only lists. A record changed differently on both sides
+    keeps the local version and is reported. Without a base (base is None) both
+    sides are kept: records on only one side survive and differing ones conflict.
+    Returns (merged data or None to delete the shard, list of conflict descriptions).
+    """
+    if shard in ("activity_log", "import_history", "export_history"):
+        return _merge_log(base or [], ours or [], theirs or []), []
+    
+    if shard.startswith(f"{GITHUB_ARCHIVE_DIR}/"):
+        # Archive segments never change once written
+        return theirs if theirs is not None else ours, []
+    
+    if shard == "users":
+        merged, conflicts = _merge_keyed(base or {}, ours or {}, theirs or {})
+        return merged, [f"user {username}" for username in conflicts]
+    
+    # Client shard: a client deleted on one side is a single record
+    if ours is None or theirs is None:
+        merged, conflicted = _merge_record(base, ours, theirs)
+        client = ours or theirs or base
+        return merged, [f"client {client.get('name', client.get('id'))}"] if conflicted else []
+    
+    base_info, base_reservations = _split_client(base) if base is not None else (None, {})
+    our_info, our_reservations = _split_client(ours)
+    their_info, their_reservations = _split_client(theirs)
+    
+    info, info_conflicted = _merge_record(base_info, our_info, their_info)
+    reservations, reservation_conflicts = _merge_keyed(base_reservations, our_reservations, their_reservations)
+    
+    conflicts = [f"client {info.get('name', info.get('id'))}"] if info_conflicted else []
+    conflicts += [f"reservation {key} of {info.get('name', info.get('id'))}" for key in reservation_conflicts]
+    return {**info, "reservations": list(reservations.values())}, conflicts
+
+def merge_snapshot_file(connection, path, base_sha, content, head_sha):
+    """Merge local snapshot bytes with the branch head's version of the same file (no base_sha: no common base)"""
+    shard = path[len(GITHUB_DATA_DIR) + 1:-len(SNAPSHOT_EXTENSION)]
+    base = None if base_sha is None else decode_snapshot(connection.get_blob(base_sha))[0]
+    ours = None if content is None else decode_snapshot(content)[0]
+    theirs = None if head_sha is None else decode_snapshot(connection.get_blob(head_sha))[0]
+    
+    merged, conflicts = merge_shard(shard, base, ours, theirs)
+    return (None if merged is None else encode_snapshot(merged)), conflicts
+
+def commit_files_to_github(connection, files, commit_message, prune_dir=None):
+    """Write any number of files in a single commit via the Git Data API
+
+    files maps repository paths to their new content (bytes), or None to delete
+    the file. With prune_dir, files under that directory that are not listed and
+    that this process loaded or wrote before are deleted as well. Files identical
+    to the branch head are skipped.
+    
+    Saves are optimistic: a snapshot file that changed on GitHub since this
+    process last loaded or wrote it is three-way merged with the local version
+    (one it never saw is merged without a base, keeping both sides' records),
+    and if the branch moves before the ref update the commit is rebuilt on the
+    new head. Returns (new commit SHA or None if nothing changed, number of
+    skipped files, merged paths, conflict descriptions).
+    """
+    for attempt in range(GITHUB_COMMIT_ATTEMPTS):
+        try:
+            return _commit_files_on_head(connection, files, commit_message, prune_dir)
+        except GithubException as e:
+            # 422: the ref update was not a fast-forward because someone else committed
+            if e.status != 422 or attempt == GITHUB_COMMIT_ATTEMPTS - 1:
+                raise
+
+def _commit_files_on_head(connection, files, commit_message, prune_dir):
+    """One attempt of commit_files_to_github against the current branch head"""
+    repo = connection.repo
+    ref = repo.get_git_ref(f"heads/{repo.default_branch}")
+    base_commit = repo.get_git_commit(ref.object.sha)
+    
+    # Deletions are only valid for paths that exist in the base tree, and files whose
+    # bytes match the base tree are left out
+    existing_paths = connection.get_tree_paths(base_commit.sha)
+    known_shas = connection.persisted_blob_shas
+    
+    if prune_dir:
+        # Only prune files this process knew about; newer remote files are someone else's
+        # (and with nothing loaded yet, every remote file is)
+        files = dict(files)
+        for path in existing_paths:
+            if path.startswith(f"{prune_dir}/") and path in known_shas:
+                files.setdefault(path, None)
+    
+    elements = []
+    written = {}
+    merged = set()
+    conflicts = []
+    for path, content in files.items():
+        head_sha = existing_paths.get(path)
+        known_sha = known_shas.get(path)
+        
+        if (
+            head_sha != known_sha
+            and path.endswith(SNAPSHOT_EXTENSION)
+            and (content is None or git_blob_sha(content) != head_sha)
+        ):
+            # Changed on GitHub since we last saw it (or never seen): keep both sides' changes
+            content, path_conflicts = merge_snapshot_file(connection, path, known_sha, content, head_sha)
+            conflicts.extend(path_conflicts)
+            merged.add(path)
+        
+        if content is None:
+            if head_sha:
+                elements.append(InputGitTreeElement(path, "100644", "blob", sha=None))
+                written[path] = None
+        elif head_sha != git_blob_sha(content):
+            blob = repo.create_git_blob(base64.b64encode(content).decode(), "base64")
+            connection.remember_blob(blob.sha, content)
+            elements.append(InputGitTreeElement(path, "100644", "blob", sha=blob.sha))
+            written[path] = blob.sha
+    
+    skipped = sum(1 for path, content in files.items() if content is not None and path not in written)
+    if not elements:
+        return None, skipped, merged, conflicts
+    
+    tree = repo.create_git_tree(elements, base_commit.tree)
+    commit = repo.create_git_commit(commit_message, tree, [base_commit])
+    ref.edit(commit.sha)
+    connection.set_head_sha(commit.sha)
+    
+    for path, sha in written.items():
+        if path in merged:
+            # The merged file holds remote changes the shared store has not loaded,
+            # so keep the old base: the next save merges against it again
+            continue
+        if sha is None:
+            connection.persisted_blob_shas.pop(path, None)
+        else:
+            connection.persisted_blob_shas[path] = sha
+    
+    return commit.sha, skipped, merged, conflicts
+
+def commit_files_with_contents_api(repo, files, commit_message):
+    """Write files one commit at a time via the contents API (needed for empty repositories)"""
+    for path, content in files.items():
+        # Check if file exists
+        try:
+            contents = repo.get_contents(path)
+        except GithubException as e:
+            if e.status != 404:
+                raise
+            contents = None
+        
+        if content is None:
+            # Delete file
+            if contents is not None:
+                repo.delete_file(contents.path, commit_message, contents.sha)
+        elif contents is not None:
+            # Update file
+            repo.update_file(contents.path, commit_message, content, contents.sha)
+        else:
+            # Create file
+            repo.create_file(path, commit_message, content)
+
+def write_files_to_github(token, repo_name, files, commit_message, prune_dir=None):
+    """Commit files to GitHub; returns (skipped files, merged files, conflict descriptions)
+
+    Runs on the background writer thread, so no Streamlit calls are allowed here.
+    """
+    connection = get_github_connection(token, repo_name)
+    
+    try:
+        _, skipped, merged, conflicts = commit_files_to_github(connection, files, commit_message, prune_dir)
+        return skipped, len(merged), conflicts
+    except GithubException as e:
+        # The Git Data API is unavailable until the repository has a first commit
+        if e.status != 409:
+            raise
+        commit_files_with_contents_api(connection.repo, files, commit_message)
+        return 0, 0, []
+
+class BackgroundWriter:
+    """Worker thread that queues GitHub saves and merges bursts into a single commit
+
+    Saves submitted for the same (token, repository) are merged file by file, so only
+    the newest content of each file is written. A batch is flushed once no new save
+    arrived for debounce_seconds, or at the latest max_delay_seconds after its first
+    save. Failed batches stay queued and are retried after retry_seconds. Conflicts
+    reported by the write function are kept until dismissed.
+    """
+
+    def __init__(self, write_function, debounce_seconds, max_delay_seconds, retry_seconds=30):
+        self.write_function = write_function
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.retry_seconds = retry_seconds
+        self.last_flushed_at = None
+        self.last_error = None
+        self.flush_count = 0
+        self.skipped_count = 0
+        self.merged_count = 0
+        self.conflicts = []
+        self._condition = threading.Condition()
+        self._pending = {}
+        self._in_flight = 0
+        self._flush_requested = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="videmi-background-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def submit(self, token, repo_name, files, commit_message, prune_dir=None):
+        """Queue files for writing; newer content replaces queued content for the same path"""
+        with self._condition:
+            now = time.monotonic()
+            batch = self._pending.setdefault((token, repo_name), {
+                "files": {},
+                "prune_dir": None,
+                "messages": [],
+                "first_at": now,
+                "retry_at": None
+            })
+            batch["files"].update(files)
+            batch["prune_dir"] = batch["prune_dir"] or prune_dir
+            batch["messages"].append(commit_message)
+            batch["last_at"] = now
+            self._condition.notify_all()
 
-if 'current_user' not in st.session_state:
-    st.session_state.current_user = None
+    def status(self):
+        """Pending file count and the outcome of the last flush"""
+        with self._condition:
+            return {
+                "pending": sum(len(batch["files"]) for batch in self._pending.values()),
+                "writing": self._in_flight > 0,
+                "last_flushed_at": self.last_flushed_at,
+                "last_error": self.last_error,
+                "flush_count": self.flush_count,
+                "skipped_count": self.skipped_count,
+                "merged_count": self.merged_count,
+                "conflicts": list(self.conflicts)
+            }
 
-if 'github_token' not in st.session_state:
-    st.session_state.github_token = None
+    def clear_conflicts(self):
+        """Forget reported conflicts once the user has seen them"""
+        with self._condition:
+            self.conflicts = []
 
-if 'github_repo' not in st.session_state:
-    st.session_state.github_repo = None
+    def flush(self, timeout=30):
+        """Write everything queued now and wait for it; returns False on error or timeout"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._pending or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (not self._in_flight and not self._flush_requested):
+                    # Timed out, or the forced flush already ran and failed
+                    return False
+                self._condition.wait(remaining)
+            return True
 
-if 'imported_data' not in st.session_state:
-    st.session_state.imported_data = None
+    def shutdown(self, timeout=30):
+        """Flush queued saves and stop the worker (registered with atexit)"""
+        self.flush(timeout)
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
 
-if 'import_history' not in st.session_state:
-    st.session_state.import_history = []
+    def _due_at(self, batch):
+        due_at = min(batch["last_at"] + self.debounce_seconds, batch["first_at"] + self.max_delay_seconds)
+        if batch["retry_at"] is not None:
+            due_at = max(due_at, batch["retry_at"])
+        return due_at
 
-if 'export_history' not in st.session_state:
-    st.session_state.export_history = []
+    def _take_due_batches(self):
+        """Wait until at least one batch is due and remove it from the queue"""
+        with self._condition:
+            while True:
+                if self._stopped:
+                    return None
+                
+                now = time.monotonic()
+                if self._flush_requested:
+                    due = dict(self._pending)
+                    self._flush_requested = False
+                else:
+                    due = {key: batch for key, batch in self._pending.items() if self._due_at(batch) <= now}
+                
+                if due:
+                    for key in due:
+                        del self._pending[key]
+                    self._in_flight += 1
+                    return due
+                
+                if self._pending:
+                    self._condition.wait(min(self._due_at(batch) for batch in self._pending.values()) - now)
+                else:
+                    self._condition.wait()
 
-if 'notifications' not in st.session_state:
-    st.session_state.notifications = []
+    def _requeue(self, key, batch):
+        """Put a failed batch back without overwriting anything queued since"""
+        pending = self._pending.get(key)
+        if pending is not None:
+            batch["files"].update(pending["files"])
+            batch["messages"].extend(pending["messages"])
+            batch["prune_dir"] = batch["prune_dir"] or pending["prune_dir"]
+            batch["last_at"] = pending["last_at"]
+        batch["retry_at"] = time.monotonic() + self.retry_seconds
+        self._pending[key] = batch
 
-if 'activity_log' not in st.session_state:
-    st.session_state.activity_log = []
+    def _run(self):
+        while True:
+            batches = self._take_due_batches()
+            if batches is None:
+                return
+            
+            for (token, repo_name), batch in batches.items():
+                messages = batch["messages"]
+                commit_message = messages[-1] if len(messages) == 1 else f"{messages[-1]} ({len(messages)} saves)"
+                
+                try:
+                    skipped, merged, conflicts = self.write_function(
+                        token, repo_name, batch["files"], commit_message, batch["prune_dir"]
+                    )
+                except Exception as e:
+                    with self._condition:
+                        self.last_error = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}: {e}"
+                        self._requeue((token, repo_name), batch)
+                else:
+                    with self._condition:
+                        self.last_flushed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                        self.last_error = None
+                        self.flush_count += 1
+                        self.skipped_count += skipped
+                        self.merged_count += merged
+                        self.conflicts = (self.conflicts + conflicts)[-WRITER_MAX_CONFLICTS:]
+            
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
 
-# Helper functions
-def log_activity(activity_type, description, user=None):
-    """Log user activity"""
-    if user is None and st.session_state.current_user:
-        user = st.session_state.current_user
-    
-    st.session_state.activity_log.append({
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "user": user,
-        "type": activity_type,
-        "description": description
-    })
+@st.cache_resource
+def get_background_writer():
+    """Process-wide background writer shared by all sessions"""
+    return BackgroundWriter(write_files_to_github, SAVE_DEBOUNCE_SECONDS, SAVE_MAX_DELAY_SECONDS)
 
-def add_notification(message, type="info"):
-    """Add a notification to the session state"""
-    st.session_state.notifications.append({
-        "message": message,
-        "type": type,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "read": False
-    })
+def save_data_to_github(shards, commit_message, prune_clients=False):
+    """Queue changed shards for a single GitHub commit (None deletes a shard)
 
-def save_data_to_github(data, filename, commit_message):
-    """Save data to GitHub repository"""
+    With prune_clients, remote client shards that this process loaded or wrote but
+    that are not part of this save are deleted, so a full upload replaces the remote
+    state like the old single file did. Shards added on GitHub by someone else are kept.
+    """
     if not st.session_state.github_token or not st.session_state.github_repo:
         st.error("GitHub integration not configured. Please set up GitHub in Settings.")
         return False
     
     try:
-        # Initialize GitHub client
-        g = Github(st.session_state.github_token)
-        repo = g.get_repo(st.session_state.github_repo)
+        # Encode snapshots now; the writer thread must not see later changes
+        files = {
+            f"{GITHUB_DATA_DIR}/{shard}{SNAPSHOT_EXTENSION}": None if data is None else encode_snapshot(data)
+            for shard, data in shards.items()
+        }
         
-        # Convert data to JSON
-        json_data = json.dumps(data, indent=2, default=str)
+        # Skip files whose bytes match the last version persisted to GitHub
+        connection = get_github_connection(st.session_state.github_token, st.session_state.github_repo)
+        unchanged = [
+            path for path, content in files.items()
+            if content is not None and connection.is_persisted(path, content)
+        ]
         
-        # Check if file exists
-        try:
-            contents = repo.get_contents(filename)
-            # Update file
-            repo.update_file(
-                contents.path,
-                commit_message,
-                json_data,
-                contents.sha
-            )
-        except:
-            # Create file
-            repo.create_file(
-                filename,
+        if not prune_clients:
+            # (A pruning save must list every client, so the writer skips those against the tree instead)
+            for path in unchanged:
+                del files[path]
+        
+        # Remove version 1 files of the shards being written (the writer drops paths that do not exist)
+        for shard in shards:
+            legacy_path = f"{GITHUB_DATA_DIR}/{shard}{LEGACY_SNAPSHOT_EXTENSION}"
+            if prune_clients or legacy_path in connection.persisted_blob_shas:
+                files[legacy_path] = None
+        
+        if unchanged:
+            log_activity("github", f"Skipped {len(unchanged)} unchanged file(s)", mark_changed=False)
+        
+        if files:
+            get_background_writer().submit(
+                st.session_state.github_token,
+                st.session_state.github_repo,
+                files,
                 commit_message,
-                json_data
+                prune_dir=f"{GITHUB_DATA_DIR}/clients" if prune_clients else None
             )
+            
+            log_activity("github", f"Queued {len(files)} file(s) for GitHub: {GITHUB_DATA_DIR}/", mark_changed=False)
         
-        log_activity("github", f"Saved data to GitHub: {filename}")
-        add_notification(f"Successfully saved data to GitHub: {filename}", "success")
         return True
     
     except Exception as e:
@@ -169,53 +2916,190 @@ def save_data_to_github(data, filename, commit_message):
         add_notification(f"Failed to save data to GitHub: {str(e)}", "error")
         return False
 
-def load_data_from_github(filename):
-    """Load data from GitHub repository"""
+def load_changes_from_github(connection, since_sha, head_sha):
+    """Fetch the snapshot files that changed between two commits
+
+    Returns {shard: (blob SHA, data), with (None, None) for deleted shards}, or
+    None when the difference cannot be applied on its own: history was rewritten,
+    the compare API truncated the file list, or old-format files changed.
+    """
+    try:
+        comparison = connection.repo.compare(since_sha, head_sha)
+    except GithubException:
+        # For example the commit no longer exists after a force push
+        return None
+    
+    if comparison.status not in ("ahead", "identical") or len(comparison.files) >= GITHUB_COMPARE_MAX_FILES:
+        return None
+    
+    changed = {}
+    for file in comparison.files:
+        if file.status == "renamed":
+            changed[file.previous_filename] = None
+        changed[file.filename] = None if file.status == "removed" else file.sha
+    
+    shas = {}
+    for path, sha in changed.items():
+        if not path.startswith(f"{GITHUB_DATA_DIR}/"):
+            if path == GITHUB_DATA_FILE:
+                return None
+            continue
+        if path.endswith(LEGACY_SNAPSHOT_EXTENSION):
+            return None
+        if path.endswith(SNAPSHOT_EXTENSION):
+            shas[path[len(GITHUB_DATA_DIR) + 1:-len(SNAPSHOT_EXTENSION)]] = sha
+    
+    with ThreadPoolExecutor(max_workers=GITHUB_FETCH_WORKERS) as executor:
+        futures = {shard: executor.submit(connection.get_blob, sha) for shard, sha in shas.items() if sha}
+        contents = {shard: decode_snapshot(future.result())[0] for shard, future in futures.items()}
+    
+    return {shard: (sha, contents.get(shard)) for shard, sha in shas.items()}
+
+def load_data_from_github():
+    """Load data from GitHub repository, fetching changed shards in parallel
+
+    Returns (data, changes, head_sha, version). After a previous load only the
+    shards changed since then are fetched and returned as changes (see
+    apply_shard_changes); otherwise data holds the whole snapshot. Both are None
+    when nothing changed, and everything is None if loading failed. version is
+    the oldest snapshot format found, so callers can rewrite version 1 files.
+    """
     if not st.session_state.github_token or not st.session_state.github_repo:
         st.error("GitHub integration not configured. Please set up GitHub in Settings.")
-        return None
+        return None, None, None, None
     
     try:
-        # Initialize GitHub client
-        g = Github(st.session_state.github_token)
-        repo = g.get_repo(st.session_state.github_repo)
+        connection = get_github_connection(st.session_state.github_token, st.session_state.github_repo)
+        
+        # Conditional request: an unchanged branch costs a 304 and nothing is parsed
+        head_sha = connection.get_head_sha()
+        store = get_data_store()
+        if head_sha == store.github_loaded_sha:
+            log_activity("github", "GitHub data unchanged since last load", mark_changed=False)
+            add_notification("GitHub data is already up to date", "info")
+            return None, None, head_sha, SNAPSHOT_VERSION
+        
+        # After a previous load, fetch only the shards changed since that commit
+        changes = None
+        if store.github_loaded_sha:
+            changes = load_changes_from_github(connection, store.github_loaded_sha, head_sha)
+        
+        if changes is not None:
+            client_ids_by_path = {client_shard_path(client_id): client_id for client_id in store.clients}
+            conflicts = []
+            shards = {}
+            
+            for shard, (sha, theirs) in changes.items():
+                path = f"{GITHUB_DATA_DIR}/{shard}{SNAPSHOT_EXTENSION}"
+                base_sha = connection.persisted_blob_shas.get(path)
+                
+                if shard in store.dirty_shards and base_sha:
+                    # Unsaved changes to the same shard here: keep both sides (it stays dirty)
+                    base, _ = decode_snapshot(connection.get_blob(base_sha))
+                    theirs, shard_conflicts = merge_shard(shard, base, build_shard(shard, client_ids_by_path), theirs)
+                    conflicts.extend(shard_conflicts)
+                
+                shards[shard] = theirs
+                if sha:
+                    connection.persisted_blob_shas[path] = sha
+                else:
+                    connection.persisted_blob_shas.pop(path, None)
+            
+            for conflict in conflicts:
+                add_notification(f"Conflicting change to {conflict} on GitHub; your unsaved version was kept", "warning")
+            
+            log_activity("github", f"Loaded {len(shards)} changed file(s) from GitHub since {store.github_loaded_sha[:7]}")
+            add_notification(f"Successfully loaded {len(shards)} changed file(s) from GitHub", "success")
+            return None, shards, head_sha, SNAPSHOT_VERSION
+        
+        # List the shards, preferring the current format when both versions of a shard exist
+        paths = connection.get_tree_paths(head_sha)
+        files = {}
+        for extension in (LEGACY_SNAPSHOT_EXTENSION, SNAPSHOT_EXTENSION):
+            for path, sha in paths.items():
+                if path.startswith(f"{GITHUB_DATA_DIR}/") and path.endswith(extension):
+                    files[path[len(GITHUB_DATA_DIR) + 1:-len(extension)]] = sha
+        
+        if not files:
+            # Fall back to the legacy single-file snapshot
+            if GITHUB_DATA_FILE not in paths:
+                raise FileNotFoundError(f"No data found in {GITHUB_DATA_DIR}/ or {GITHUB_DATA_FILE}")
+            
+            data, version = decode_snapshot(connection.get_blob(paths[GITHUB_DATA_FILE]))
+            connection.persisted_blob_shas = dict(paths)
+            
+            log_activity("github", f"Loaded data from GitHub: {GITHUB_DATA_FILE}")
+            add_notification(f"Successfully loaded data from GitHub: {GITHUB_DATA_FILE}", "success")
+            return data, None, head_sha, version
+        
+        # Fetch every shard concurrently (blobs already seen by this process come from the cache)
+        with ThreadPoolExecutor(max_workers=GITHUB_FETCH_WORKERS) as executor:
+            futures = {shard: executor.submit(connection.get_blob, sha) for shard, sha in files.items()}
+            shards = {shard: decode_snapshot(future.result()) for shard, future in futures.items()}
         
-        # Get file contents
-        contents = repo.get_contents(filename)
-        data = json.loads(contents.decoded_content.decode())
+        # Reassemble the application state
+        data = {"clients": {}}
+        for shard, (content, _) in shards.items():
+            if shard.startswith("clients/"):
+                data["clients"][content["id"]] = content
+            elif shard.startswith(f"{GITHUB_ARCHIVE_DIR}/"):
+                data.setdefault("activity_archive", {})[shard[len(GITHUB_ARCHIVE_DIR) + 1:]] = content
+            elif shard in GITHUB_SINGLETON_SHARDS:
+                data[shard] = content
         
-        log_activity("github", f"Loaded data from GitHub: {filename}")
-        add_notification(f"Successfully loaded data from GitHub: {filename}", "success")
-        return data
+        version = min(version for _, version in shards.values())
+        
+        # This tree is now the base that later saves merge against
+        connection.persisted_blob_shas = dict(paths)
+        
+        log_activity("github", f"Loaded {len(shards)} file(s) from GitHub: {GITHUB_DATA_DIR}/")
+        add_notification(f"Successfully loaded {len(shards)} file(s) from GitHub", "success")
+        return data, None, head_sha, version
     
     except Exception as e:
         st.error(f"Error loading from GitHub: {e}")
         add_notification(f"Failed to load data from GitHub: {str(e)}", "error")
-        return None
+        return None, None, None, None
 
 def save_data():
-    """Save data to a file or GitHub"""
+    """Save changed data to GitHub (the local database is already updated row by row)"""
     try:
-        # Convert datetime objects to strings for JSON serialization
-        data = {
-            "clients": st.session_state.clients,
-            "users": st.session_state.users,
-            "activity_log": st.session_state.activity_log,
-            "import_history": st.session_state.import_history,
-            "export_history": st.session_state.export_history
-        }
-        
         # Save to GitHub if configured
         if st.session_state.github_token and st.session_state.github_repo:
+            store = get_data_store()
+            
+            # Take the changed shards of every session in one step
+            with store.lock.write():
+                client_ids_by_path = {client_shard_path(client_id): client_id for client_id in store.clients}
+                full_upload = not store.github_synced
+                
+                if full_upload:
+                    # First save for this repository: upload everything
+                    mark_all_dirty()
+                
+                shards = {
+                    shard: build_shard(shard, client_ids_by_path)
+                    for shard in store.dirty_shards
+                }
+                store.dirty_shards = set()
+            
+            if not shards:
+                st.success("No changes to save.")
+                return True
+            
             success = save_data_to_github(
-                data,
-                "videmi_services_data.json",
-                f"Update data - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+                shards,
+                f"Update data - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                prune_clients=full_upload
             )
             if success:
+                store.github_synced = True
                 return True
+            
+            # Keep the shards dirty so the next save retries them
+            mark_dirty(*shards)
         
-        # Otherwise, just show success message (in a real app, save to database)
+        # Otherwise, every change has already been written to the local database
         st.success("Data saved successfully!")
         log_activity("data", "Saved application data")
         return True
@@ -230,17 +3114,38 @@ def load_data():
     try:
         # Load from GitHub if configured
         if st.session_state.github_token and st.session_state.github_repo:
-            data = load_data_from_github("videmi_services_data.json")
-            if data:
-                st.session_state.clients = data.get("clients", {})
-                st.session_state.users = data.get("users", st.session_state.users)
-                st.session_state.activity_log = data.get("activity_log", [])
-                st.session_state.import_history = data.get("import_history", [])
-                st.session_state.export_history = data.get("export_history", [])
+            # Make sure queued saves are on GitHub before reading it back
+            get_background_writer().flush()
+            
+            data, changes, head_sha, version = load_data_from_github()
+            if head_sha:
+                with store_write() as store:
+                    if data is not None:
+                        replace_all_data(data)
+                        store.dirty_shards = set()
+                        store.github_synced = True
+                    elif changes:
+                        apply_shard_changes(changes)
+                    
+                    store.github_loaded_sha = head_sha
+                
+                if version < SNAPSHOT_VERSION:
+                    # Rewrite every shard in the current format (and remove the old files)
+                    store.github_synced = False
+                    log_activity("github", f"Migrating GitHub data from snapshot version {version} to {SNAPSHOT_VERSION}", mark_changed=False)
+                    save_data()
                 return True
         
-        # In a real app, you would load from a database
-        # For demo, we'll use the session state data
+        # Otherwise, reload from the local database
+        with store_write() as store:
+            store.clients = db_load_clients()
+            store.users = db_load_users() or store.users
+            store.activity_log = db_load_activity_log()
+            store.activity_archive = db_load_archive_index()
+            store.import_history = db_load_history("import_history")
+            store.export_history = db_load_history("export_history")
+            store.reservations.rebuild(store.clients)
+            store.search.rebuild(store.clients)
         log_activity("data", "Loaded application data")
         return True
     
@@ -270,6 +3175,60 @@ def format_currency(amount):
     """Format a number as currency"""
     return f"${amount:.2f}"
 
+def reservation_amount(reservation):
+    """Amount of a reservation as a number (0 when missing or not a number)"""
+    try:
+        return float(reservation.get("amount") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def client_name_map():
+    """Map of client ID to client name, for labelling reservation rows"""
+    return {client_id: client["name"] for client_id, client in st.session_state.clients.items()}
+
+def select_reservations(candidates=None, **filters):
+    """Rows of this session's reservation frame matching field=value filters (see ReservationIndexes)"""
+    store = get_data_store()
+    with store.lock.read():
+        return store.reservations.indexes(st.session_state.reservation_table).select(candidates, **filters)
+
+def archive_segments():
+    """Entries of every activity archive segment by name, oldest first (decompresses every segment)"""
+    store = get_data_store()
+    with store.lock.read():
+        names = [segment["name"] for segment in store.activity_archive]
+    
+    return {name: db_load_archive_segment(name) or [] for name in names}
+
+def archived_activity(**filters):
+    """Archived activity entries matching field=value filters, oldest first (decompresses every segment)"""
+    return [
+        entry
+        for entries in archive_segments().values()
+        for entry in entries
+        if all(entry.get(field) == value for field, value in filters.items())
+    ]
+
+def search_records(query, limit=20, kinds=None):
+    """Keys of the clients, reservations and properties matching a search query (see SearchIndex)"""
+    store = get_data_store()
+    with store.lock.read():
+        return store.search.search(query, limit, kinds)
+
+def dashboard_totals():
+    """Dashboard figures for today from the store's running reservation totals"""
+    store = get_data_store()
+    with store.lock.read():
+        return store.reservations.totals.summary(pd.Timestamp(datetime.now().date()))
+
+def client_reservation_frame(client_id):
+    """Reservation rows of one client"""
+    return select_reservations(client_id=client_id)
+
+def reservation_intervals(client_id=None):
+    """Interval index over this session's reservation rows (one client's, or all)"""
+    return get_data_store().reservations.intervals(st.session_state.reservation_table, client_id)
+
 def verify_password(username, password):
     """Verify a user's password"""
     if username not in st.session_state.users:
@@ -295,24 +3254,229 @@ def has_permission(required_role):
     
     return False
 
-def parse_csv(file):
-    """Parse a CSV file and return a DataFrame"""
+def parse_csv(file, nrows=None):
+    """Parse a CSV file (or its first nrows rows) and return a DataFrame"""
     try:
-        df = pd.read_csv(file)
+        df = pd.read_csv(file, nrows=nrows)
         return df
     except Exception as e:
         st.error(f"Error parsing CSV file: {e}")
         return None
 
-def parse_excel(file):
-    """Parse an Excel file and return a DataFrame"""
+EXCEL_ENGINES = {".xls": "xlrd", ".xlsx": "openpyxl", ".xlsm": "openpyxl"}
+EXCEL_IMPORT_WORKERS = 4  # Processes reading the sheets of one workbook in parallel
+
+def excel_engine(filename):
+    """Reader for a workbook by its extension: xlrd for legacy .xls, openpyxl otherwise"""
+    return EXCEL_ENGINES.get(os.path.splitext(filename or "")[1].lower(), "openpyxl")
+
+def excel_sheet_names(data, engine):
+    """Names of the sheets in a workbook, without reading their cells"""
+    if engine == "xlrd":
+        return xlrd.open_workbook(file_contents=data, on_demand=True).sheet_names()
+    
+    workbook = openpyxl.load_workbook(BytesIO(data), read_only=True)
     try:
-        df = pd.read_excel(file)
-        return df
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+def read_excel_sheets(data, engine, sheet_names):
+    """DataFrames for the given sheets of a workbook, read in parallel when there are several (and CPUs for them)"""
+    workers = min(len(sheet_names), EXCEL_IMPORT_WORKERS, os.cpu_count() or 1)
+    if workers < 2:
+        return [read_excel_sheet(data, engine, sheet_name) for sheet_name in sheet_names]
+    
+    return excel_reader.read_excel_sheets(data, engine, sheet_names, workers)
+
+def merge_excel_sheets(sheets, sheet_column=None):
+    """One DataFrame from {sheet name: DataFrame}, leaving out empty sheets
+
+    With sheet_column, sheets that lack that column get it filled with their
+    name, as for workbooks with one sheet per property.
+    """
+    frames = []
+    for sheet_name, df in sheets.items():
+        df = df.dropna(how="all")
+        if df.empty:
+            continue
+        if sheet_column and sheet_column not in df.columns:
+            df = df.assign(**{sheet_column: sheet_name})
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def parse_excel(file, sheet_column=None):
+    """Parse an Excel workbook and return its sheets as one DataFrame
+
+    Workbooks with several sheets offer a choice of sheets (all by default),
+    which are read in parallel and merged; see merge_excel_sheets for sheet_column.
+    """
+    try:
+        data = file.getvalue()
+        engine = excel_engine(getattr(file, "name", ""))
+        sheet_names = excel_sheet_names(data, engine)
+        
+        if len(sheet_names) > 1:
+            sheet_names = st.multiselect("Sheets to Import", options=sheet_names, default=sheet_names)
+            if not sheet_names:
+                st.warning("Select at least one sheet to import.")
+                return None
+        
+        sheets = read_excel_sheets(data, engine, sheet_names)
+        return merge_excel_sheets(dict(zip(sheet_names, sheets)), sheet_column)
     except Exception as e:
         st.error(f"Error parsing Excel file: {e}")
         return None
 
+RESERVATION_IMPORT_REQUIRED = ["property_name", "check_in_date", "check_out_date"]
+IMPORT_CHUNK_ROWS = 10_000  # Rows a streaming import reads, checks and saves at a time
+IMPORT_SKIPPED_ROWS_SHOWN = 1000  # Skipped rows listed after a streaming import; the rest are counted
+RESERVATION_STATUSES = {"active": "Active", "cancelled": "Cancelled", "canceled": "Cancelled"}
+RESERVATION_IMPORT_TEXT_FIELDS = {
+    "property_name": "",
+    "guest_name": "",
+    "guest_email": "",
+    "guest_phone": "",
+    "client_profile": "Regular Stay",
+    "notes": ""
+}
+
+def bulk_reservation_ids(count):
+    """count new reservation IDs (random UUIDs) drawn in one go"""
+    raw = np.frombuffer(os.urandom(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+    raw[:, 6] = raw[:, 6] & 0x0F | 0x40  # Version 4
+    raw[:, 8] = raw[:, 8] & 0x3F | 0x80  # RFC 4122 variant
+    digits = raw.tobytes().hex()
+    return [
+        f"res-{digits[i:i + 8]}-{digits[i + 8:i + 12]}-{digits[i + 12:i + 16]}-{digits[i + 16:i + 20]}-{digits[i + 20:i + 32]}"
+        for i in range(0, 32 * count, 32)
+    ]
+
+def prepare_reservation_import(df, client_id):
+    """Validate and convert an import DataFrame a column at a time
+
+    Dates are parsed once per distinct value, num_guests and amount are coerced
+    to numbers and known statuses to their canonical spelling; other statuses
+    (a channel's "Confirmed", say) are kept as given. Blank cells take the
+    form's defaults. Returns (reservations, batch frame, problems, other
+    statuses), where problems is a DataFrame of the rows left out (1-based)
+    and why, and other statuses counts the imported rows by unrecognised status.
+    """
+    count = len(df)
+    df = df.reset_index(drop=True)
+    
+    def column(field, default):
+        if field not in df.columns:
+            return pd.Series([default] * count, dtype=object)
+        values = df[field].astype(object)
+        return values.where(values.notna() & (values.astype(str).str.strip() != ""), default)
+    
+    text = {field: column(field, default).astype(str).str.strip() for field, default in RESERVATION_IMPORT_TEXT_FIELDS.items()}
+    
+    dates = {}
+    days = {}
+    for field in ("check_in_date", "check_out_date"):
+        values = df[field] if field in df.columns else pd.Series([""] * count, dtype=object)
+        dates[field] = normalize_date_column(values, SNAPSHOT_FIELD_TYPES[field])
+        days[field] = pd.to_datetime(dates[field].astype(str), format="%Y-%m-%d", errors="coerce")
+    
+    num_guests = pd.to_numeric(column("num_guests", 1), errors="coerce")
+    amount = pd.to_numeric(column("amount", 0), errors="coerce")
+    given_status = column("status", "Active").astype(str).str.strip()
+    known_status = given_status.str.lower().map(RESERVATION_STATUSES)
+    status = known_status.fillna(given_status)
+    
+    checks = [
+        (text["property_name"] == "", "Missing property name"),
+        (days["check_in_date"].isna(), "Missing or invalid check-in date"),
+        (days["check_out_date"].isna(), "Missing or invalid check-out date"),
+        (days["check_out_date"] <= days["check_in_date"], "Check-out date must be after check-in date"),
+        (num_guests.isna() | (num_guests < 1) | (num_guests % 1 != 0), "Number of guests must be a whole number of at least 1"),
+        (amount.isna() | (amount < 0), "Amount must be a number of at least 0")
+    ]
+    failed = np.zeros(count, dtype=bool)
+    reasons = np.full(count, "", dtype=object)
+    for mask, reason in checks:
+        mask = mask.to_numpy(dtype=bool, na_value=False) & ~failed
+        reasons[mask] = reason
+        failed |= mask
+    problems = pd.DataFrame({"Row": np.flatnonzero(failed) + 1, "Problem": reasons[failed]})
+    
+    valid = np.flatnonzero(~failed)
+    other_statuses = given_status.iloc[valid][known_status.iloc[valid].isna()].value_counts().to_dict()
+    created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    columns = {field: values.iloc[valid].tolist() for field, values in text.items()}
+    columns.update({
+        "id": bulk_reservation_ids(len(valid)),
+        "check_in_date": dates["check_in_date"].iloc[valid].tolist(),
+        "check_out_date": dates["check_out_date"].iloc[valid].tolist(),
+        "num_guests": num_guests.iloc[valid].astype("int64").tolist(),
+        "amount": amount.iloc[valid].astype("float64").round(2).tolist(),
+        "status": status.iloc[valid].tolist(),
+        "created_at": [created_at] * len(valid),
+        "imported": [True] * len(valid)
+    })
+    reservations = Reservation.from_columns(columns)
+    
+    batch = ReservationTable._assemble([client_id] * len(valid), reservations, {
+        "id": columns["id"],
+        "property_name": columns["property_name"],
+        "status": columns["status"],
+        "check_in": days["check_in_date"].iloc[valid],
+        "check_out": days["check_out_date"].iloc[valid],
+        "created_at": pd.to_datetime(pd.Series(columns["created_at"], dtype=object), format="%Y-%m-%d %H:%M:%S"),
+        "guest_email": text["guest_email"].iloc[valid].str.lower(),
+        "num_guests": num_guests.iloc[valid].astype("int64"),
+        "amount": amount.iloc[valid].astype("float64").round(2)
+    })
+    return reservations, batch, problems, other_statuses
+
+def show_import_skips(problems, rejected, problem_total=None, rejected_total=None, other_statuses=None):
+    """List the rows an import left out (invalid ones and ones that would overbook)
+    and note any statuses it kept without recognising them
+
+    The totals default to the number of rows listed; streaming imports list only some.
+    """
+    if other_statuses:
+        st.info(
+            f"Imported {sum(other_statuses.values())} row(s) with a status other than Active or Cancelled as given: "
+            + ", ".join(f"{status} ({count})" for status, count in other_statuses.items())
+        )
+    
+    problem_total = len(problems) if problem_total is None else problem_total
+    rejected_total = len(rejected) if rejected_total is None else rejected_total
+    
+    if problem_total:
+        st.warning(f"Skipped {problem_total} row(s) with invalid values")
+        st.dataframe(problems, use_container_width=True, hide_index=True)
+    
+    if rejected_total:
+        st.warning(f"Skipped {rejected_total} reservation(s) that would overbook a property")
+        st.dataframe(pd.DataFrame([
+            {
+                "Property": reservation.get("property_name", ""),
+                "Guest": reservation.get("guest_name", ""),
+                "Check-in": str(reservation.get("check_in_date", "")),
+                "Check-out": str(reservation.get("check_out_date", "")),
+                "Conflicts With": "; ".join(describe_reservation(conflict) for conflict in conflicts)
+            }
+            for reservation, conflicts in rejected
+        ]), use_container_width=True)
+        add_notification(f"Skipped {rejected_total} overlapping reservations during import", "warning")
+
+def record_reservation_import(client_id, imported_count, file_type="CSV/Excel"):
+    """Add a reservation import to the import history and the activity log"""
+    record_import({
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "user": st.session_state.current_user,
+        "client_id": client_id,
+        "client_name": st.session_state.clients[client_id]["name"],
+        "count": imported_count,
+        "file_type": file_type
+    })
+    
+    log_activity("import", f"Imported {imported_count} reservations for client {st.session_state.clients[client_id]['name']}", client_id=client_id)
+
 def import_reservations_from_df(df, client_id):
     """Import reservations from a DataFrame"""
     if client_id not in st.session_state.clients:
@@ -321,54 +3485,20 @@ def import_reservations_from_df(df, client_id):
     
     try:
         # Check required columns
-        required_columns = ["property_name", "check_in_date", "check_out_date"]
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = [col for col in RESERVATION_IMPORT_REQUIRED if col not in df.columns]
         
         if missing_columns:
             st.error(f"Missing required columns: {', '.join(missing_columns)}")
             return False
         
-        # Process each row
-        imported_count = 0
-        for _, row in df.iterrows():
-            # Generate a unique ID for the reservation
-            reservation_id = f"res-{uuid.uuid4()}"
-            
-            # Create reservation dictionary
-            new_reservation = {
-                "id": reservation_id,
-                "property_name": row.get("property_name", ""),
-                "guest_name": row.get("guest_name", ""),
-                "guest_email": row.get("guest_email", ""),
-                "guest_phone": row.get("guest_phone", ""),
-                "check_in_date": row.get("check_in_date", ""),
-                "check_out_date": row.get("check_out_date", ""),
-                "num_guests": row.get("num_guests", 1),
-                "client_profile": row.get("client_profile", "Regular Stay"),
-                "notes": row.get("notes", ""),
-                "status": row.get("status", "Active"),
-                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "imported": True
-            }
-            
-            # Add to the client's reservations
-            if "reservations" not in st.session_state.clients[client_id]:
-                st.session_state.clients[client_id]["reservations"] = []
-            
-            st.session_state.clients[client_id]["reservations"].append(new_reservation)
-            imported_count += 1
+        new_reservations, batch, problems, other_statuses = prepare_reservation_import(df, client_id)
         
-        # Log the import
-        st.session_state.import_history.append({
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "user": st.session_state.current_user,
-            "client_id": client_id,
-            "client_name": st.session_state.clients[client_id]["name"],
-            "count": imported_count,
-            "file_type": "CSV/Excel"
-        })
+        # Add to the client's reservations in a single transaction
+        rejected = add_reservations(client_id, new_reservations, batch)
+        imported_count = len(new_reservations) - len(rejected)
         
-        log_activity("import", f"Imported {imported_count} reservations for client {st.session_state.clients[client_id]['name']}")
+        show_import_skips(problems, rejected, other_statuses=other_statuses)
+        record_reservation_import(client_id, imported_count)
         add_notification(f"Successfully imported {imported_count} reservations", "success")
         
         return True
@@ -378,6 +3508,80 @@ def import_reservations_from_df(df, client_id):
         add_notification(f"Failed to import reservations: {str(e)}", "error")
         return False
 
+def stream_reservations_from_csv(file, client_id, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Import reservations from a CSV file a chunk of rows at a time
+
+    Each chunk is validated and saved before the next one is read, so only one
+    chunk is held as a DataFrame however long the file is. A progress bar
+    follows the position in the file. Chunks saved before an error stay imported.
+    """
+    if client_id not in st.session_state.clients:
+        st.error(f"Client with ID {client_id} not found.")
+        return False
+    
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(0)
+    
+    progress = st.progress(0.0, text="Importing reservations...")
+    row_count = imported_count = 0
+    problems = []
+    problem_total = 0
+    rejected = []
+    rejected_total = 0
+    other_statuses = {}
+    
+    try:
+        for chunk in pd.read_csv(file, chunksize=chunk_rows):
+            if not row_count:
+                missing_columns = [col for col in RESERVATION_IMPORT_REQUIRED if col not in chunk.columns]
+                if missing_columns:
+                    progress.empty()
+                    st.error(f"Missing required columns: {', '.join(missing_columns)}")
+                    return False
+            
+            new_reservations, batch, chunk_problems, chunk_statuses = prepare_reservation_import(chunk, client_id)
+            chunk_rejected = add_reservations(client_id, new_reservations, batch)
+            imported_count += len(new_reservations) - len(chunk_rejected)
+            
+            # Keep the first skipped rows to list, numbered by their row in the file
+            shown = sum(len(part) for part in problems)
+            if shown < IMPORT_SKIPPED_ROWS_SHOWN and len(chunk_problems):
+                problems.append(chunk_problems.head(IMPORT_SKIPPED_ROWS_SHOWN - shown).assign(Row=lambda part: part["Row"] + row_count))
+            problem_total += len(chunk_problems)
+            rejected.extend(chunk_rejected[:IMPORT_SKIPPED_ROWS_SHOWN - len(rejected)])
+            rejected_total += len(chunk_rejected)
+            for status, count in chunk_statuses.items():
+                other_statuses[status] = other_statuses.get(status, 0) + count
+            
+            row_count += len(chunk)
+            progress.progress(
+                min(file.tell() / size, 1.0) if size else 1.0,
+                text=f"Imported {imported_count:,} of {row_count:,} rows read"
+            )
+    
+    except Exception as e:
+        progress.empty()
+        st.error(f"Error importing reservations after {row_count:,} rows: {e}")
+        add_notification(f"Failed to import reservations: {str(e)}", "error")
+        if imported_count:
+            st.info(f"{imported_count:,} reservations from earlier rows were imported.")
+            record_reservation_import(client_id, imported_count, "CSV (streamed)")
+        return False
+    
+    progress.progress(1.0, text=f"Imported {imported_count:,} of {row_count:,} rows")
+    show_import_skips(
+        pd.concat(problems, ignore_index=True) if problems else pd.DataFrame(columns=["Row", "Problem"]),
+        rejected, problem_total, rejected_total, other_statuses
+    )
+    if problem_total > IMPORT_SKIPPED_ROWS_SHOWN or rejected_total > IMPORT_SKIPPED_ROWS_SHOWN:
+        st.caption(f"Only the first {IMPORT_SKIPPED_ROWS_SHOWN:,} skipped rows of each kind are listed.")
+    
+    record_reservation_import(client_id, imported_count, "CSV (streamed)")
+    add_notification(f"Successfully imported {imported_count} reservations", "success")
+    
+    return True
+
 def import_clients_from_df(df):
     """Import clients from a DataFrame"""
     try:
@@ -390,7 +3594,7 @@ def import_clients_from_df(df):
             return False
         
         # Process each row
-        imported_count = 0
+        new_clients = []
         for _, row in df.iterrows():
             # Generate a unique ID for the client
             client_name = row.get("name", "")
@@ -411,12 +3615,14 @@ def import_clients_from_df(df):
                 "imported": True
             }
             
-            # Add to clients
-            st.session_state.clients[client_id] = new_client
-            imported_count += 1
+            new_clients.append(new_client)
+        
+        # Add to clients
+        add_clients(new_clients)
+        imported_count = len(new_clients)
         
         # Log the import
-        st.session_state.import_history.append({
+        record_import({
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "user": st.session_state.current_user,
             "count": imported_count,
@@ -480,6 +3686,9 @@ def sidebar_auth():
             st.write(f"**Logged in as:** {user_info['name']}")
             st.write(f"**Role:** {user_info['role'].capitalize()}")
             
+            # Global search (results replace the current page until cleared)
+            st.text_input("🔍 Search", key="search_query", placeholder="Clients, guests, properties")
+            
             # Navigation
             st.subheader("Navigation")
             if st.button("📊 Dashboard", use_container_width=True):
@@ -535,14 +3744,24 @@ def sidebar_auth():
                         st.rerun()
             
             # Notifications
-            unread_count = sum(1 for n in st.session_state.notifications if not n["read"])
+            notifications = st.session_state.notifications
+            unread_count = notifications.unread
             notification_label = f"🔔 Notifications ({unread_count})" if unread_count > 0 else "🔔 Notifications"
             
             with st.expander(notification_label):
-                if not st.session_state.notifications:
+                if not notifications:
                     st.write("No notifications")
                 else:
-                    for i, notification in enumerate(st.session_state.notifications):
+                    page_count = notifications.page_count()
+                    if st.session_state.get("notification_page", 1) > page_count:
+                        st.session_state.notification_page = page_count
+                    
+                    page = 1
+                    if page_count > 1:
+                        page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key="notification_page")
+                        st.caption(f"Page {page} of {page_count} ({len(notifications)} notifications)")
+                    
+                    for notification in notifications.page(page - 1):
                         with st.container(border=True):
                             col1, col2 = st.columns([4, 1])
                             
@@ -559,19 +3778,64 @@ def sidebar_auth():
                                 st.caption(f"Time: {notification['timestamp']}")
                             
                             with col2:
-                                if not notification["read"]:
-                                    if st.button("Mark Read", key=f"read_{i}"):
-                                        st.session_state.notifications[i]["read"] = True
-                                        st.experimental_rerun()
+                                if not notifications.is_read(notification):
+                                    if st.button("Mark Read", key=f"read_{notification['number']}"):
+                                        notifications.mark_read(notification["number"])
+                                        st.rerun()
                     
-                    if st.button("Clear All"):
-                        st.session_state.notifications = []
-                        st.experimental_rerun()
+                    col1, col2 = st.columns(2)
+                    
+                    with col1:
+                        if st.button("Mark All Read", disabled=unread_count == 0):
+                            notifications.mark_all_read()
+                            st.rerun()
+                    
+                    with col2:
+                        if st.button("Clear All"):
+                            notifications.clear()
+                            st.rerun()
+            
+            # GitHub sync status
+            if st.session_state.github_token and st.session_state.github_repo:
+                writer_status = get_background_writer().status()
+                
+                if writer_status["pending"] or writer_status["writing"]:
+                    st.caption(f"💾 GitHub sync: {writer_status['pending']} file(s) pending")
+                else:
+                    st.caption("💾 GitHub sync: up to date")
+                
+                if writer_status["last_flushed_at"]:
+                    st.caption(f"Last synced: {writer_status['last_flushed_at']}")
+                
+                if writer_status["skipped_count"]:
+                    st.caption(f"Unchanged files skipped: {writer_status['skipped_count']}")
+                
+                if writer_status["merged_count"]:
+                    st.caption(f"Merged with remote changes: {writer_status['merged_count']} file(s), load data to see them")
+                
+                if writer_status["conflicts"]:
+                    st.warning(
+                        "Edited on GitHub and here at the same time (your version was kept):\n"
+                        + "\n".join(f"- {conflict}" for conflict in writer_status["conflicts"])
+                    )
+                    if st.button("Dismiss Conflicts", use_container_width=True):
+                        get_background_writer().clear_conflicts()
+                        st.rerun()
+                
+                if writer_status["last_error"]:
+                    st.caption(f"⚠️ Last sync failed ({writer_status['last_error']}), retrying")
             
             # Logout button
             st.divider()
             if st.button("Logout", use_container_width=True):
                 log_activity("auth", f"User logged out: {st.session_state.current_user}")
+                
+                # Write queued changes before the session ends
+                if st.session_state.github_token and st.session_state.github_repo:
+                    save_data()
+                    with st.spinner("Saving changes to GitHub..."):
+                        get_background_writer().flush()
+                
                 st.session_state.authenticated = False
                 st.session_state.current_user = None
                 st.experimental_rerun()
@@ -629,7 +3893,9 @@ def main_app():
         return
     
     # For authenticated users, show the appropriate content
-    if st.session_state.active_tab == "dashboard":
+    if st.session_state.get("search_query", "").strip():
+        show_search(st.session_state.search_query)
+    elif st.session_state.active_tab == "dashboard":
         show_dashboard()
     elif st.session_state.active_tab == "clients":
         show_clients()
@@ -649,6 +3915,58 @@ def main_app():
             st.session_state.active_tab = "dashboard"
             st.experimental_rerun()
 
+# Search results page
+def open_search_result(client_id):
+    """Leave the search results for a client's details"""
+    st.session_state.search_query = ""
+    st.session_state.current_client = client_id
+    st.session_state.active_tab = "client_details"
+
+def show_search(query):
+    st.title("Search")
+    
+    results = search_records(query, limit=50)
+    if not results:
+        st.info(f"Nothing matches \"{query}\".")
+        return
+    
+    st.write(f"Showing the best {len(results)} matches for **{query}**")
+    client_names = client_name_map()
+    
+    for number, key in enumerate(results):
+        if key[0] == "client":
+            client_id = key[1]
+            client = st.session_state.clients.get(client_id)
+            if client is None:
+                continue
+            title = f"👥 **{client['name']}**"
+            details = f"Client · {client.get('contact_person', 'N/A')} · {client.get('email', 'N/A')}"
+        elif key[0] == "reservation":
+            entry = get_reservation(key[1])
+            if entry is None:
+                continue
+            client_id, reservation = entry
+            title = f"🗓️ **{reservation.get('guest_name') or 'Unknown Guest'}** at {reservation.get('property_name', '')}"
+            details = (
+                f"Reservation for {client_names.get(client_id, 'Unknown Client')} · "
+                f"{reservation.get('check_in_date', '')} to {reservation.get('check_out_date', '')} · "
+                f"{reservation.get('guest_email', '')}"
+            )
+        else:
+            client_id = key[1]
+            title = f"🏠 **{key[2]}**"
+            details = f"Property of {client_names.get(client_id, 'Unknown Client')}"
+        
+        with st.container(border=True):
+            col1, col2 = st.columns([4, 1])
+            
+            with col1:
+                st.write(title)
+                st.caption(details)
+            
+            with col2:
+                st.button("View Client", key=f"search_result_{number}", on_click=open_search_result, args=(client_id,))
+
 # Dashboard page
 def show_dashboard():
     st.title("Dashboard")
@@ -659,31 +3977,21 @@ def show_dashboard():
     with col1:
         st.metric("Total Clients", len(st.session_state.clients))
     
-    # Count total reservations across all clients
-    total_reservations = sum(len(client.get("reservations", [])) for client in st.session_state.clients.values())
+    # Counts and revenue come from the running totals, not a scan
+    totals = dashboard_totals()
     
     with col2:
-        st.metric("Total Reservations", total_reservations)
-    
-    # Calculate upcoming reservations (next 7 days)
-    today = datetime.now().date()
-    upcoming_count = 0
-    
-    for client in st.session_state.clients.values():
-        for reservation in client.get("reservations", []):
-            try:
-                check_in_date = datetime.strptime(reservation.get("check_in_date", ""), "%Y-%m-%d").date()
-                if today <= check_in_date <= today + timedelta(days=7):
-                    upcoming_count += 1
-            except:
-                pass
+        st.metric("Total Reservations", totals["count"])
     
     with col3:
-        st.metric("Upcoming (7 days)", upcoming_count)
+        st.metric("Upcoming (7 days)", totals["upcoming_week"])
     
     with col4:
-        # This would be calculated from actual data in a real app
-        st.metric("Monthly Revenue", "$5,240", delta="+12%")
+        # Month to date, against the same days of last month
+        revenue = totals["revenue_month"]
+        previous_revenue = totals["revenue_previous_month"]
+        delta = f"{(revenue - previous_revenue) / previous_revenue:+.0%}" if previous_revenue else None
+        st.metric("Monthly Revenue", format_currency(revenue), delta=delta)
     
     # Create two columns for charts
     col1, col2 = st.columns(2)
@@ -692,12 +4000,8 @@ def show_dashboard():
         st.subheader("Reservations by Client")
         
         # Prepare data for the chart
-        client_names = []
-        reservation_counts = []
-        
-        for client_id, client in st.session_state.clients.items():
-            client_names.append(client["name"])
-            reservation_counts.append(len(client.get("reservations", [])))
+        client_names = [client["name"] for client in st.session_state.clients.values()]
+        reservation_counts = [int(totals["by_client"].get(client_id, 0)) for client_id in st.session_state.clients]
         
         # Create a bar chart
         if client_names:
@@ -717,32 +4021,21 @@ def show_dashboard():
         st.subheader("Upcoming Reservations")
         
         # Create a calendar-like view for upcoming reservations
-        upcoming_reservations = []
-        
-        for client_id, client in st.session_state.clients.items():
-            for reservation in client.get("reservations", []):
-                try:
-                    check_in_date = datetime.strptime(reservation.get("check_in_date", ""), "%Y-%m-%d").date()
-                    if today <= check_in_date <= today + timedelta(days=30):
-                        upcoming_reservations.append({
-                            "client": client["name"],
-                            "property": reservation.get("property_name", ""),
-                            "check_in": check_in_date,
-                            "check_out": datetime.strptime(reservation.get("check_out_date", ""), "%Y-%m-%d").date(),
-                            "guests": reservation.get("num_guests", 0)
-                        })
-                except:
-                    pass
+        today = pd.Timestamp(datetime.now().date())
+        upcoming_reservations = reservation_intervals().starting_between(today, today + pd.Timedelta(days=30))
+        upcoming_reservations = upcoming_reservations[
+            upcoming_reservations["check_out"].notna()
+        ].sort_values("check_in", kind="stable")
         
-        # Sort by check-in date
-        upcoming_reservations.sort(key=lambda x: x["check_in"])
-        
-        if upcoming_reservations:
+        if len(upcoming_reservations):
             # Convert to DataFrame for display
-            df = pd.DataFrame(upcoming_reservations)
-            df["check_in"] = df["check_in"].astype(str)
-            df["check_out"] = df["check_out"].astype(str)
-            df.columns = ["Client", "Property", "Check-in", "Check-out", "Guests"]
+            df = pd.DataFrame({
+                "Client": upcoming_reservations["client_id"].map(client_name_map()).astype(str),
+                "Property": upcoming_reservations["property_name"].astype(str),
+                "Check-in": upcoming_reservations["check_in"].dt.strftime("%Y-%m-%d"),
+                "Check-out": upcoming_reservations["check_out"].dt.strftime("%Y-%m-%d"),
+                "Guests": upcoming_reservations["num_guests"]
+            }).reset_index(drop=True)
             
             st.dataframe(df, use_container_width=True, height=400)
         else:
@@ -751,12 +4044,8 @@ def show_dashboard():
     # Recent activity
     st.subheader("Recent Activity")
     
-    # Show actual activity log
-    recent_activities = sorted(
-        st.session_state.activity_log,
-        key=lambda x: datetime.strptime(x["timestamp"], "%Y-%m-%d %H:%M:%S"),
-        reverse=True
-    )[:10]  # Get the 10 most recent activities
+    # Show actual activity log (kept in time order, so the newest are at the end)
+    recent_activities = st.session_state.activity_log[-10:][::-1]
     
     if recent_activities:
         for activity in recent_activities:
@@ -809,7 +4098,7 @@ def show_clients():
             with col2:
                 filter_service = st.selectbox(
                     "Filter by Service Type",
-                    options=["All"] + list(set(client["service_type"] for client in st.session_state.clients.values() if "service_type" in client))
+                    options=["All"] + get_data_store().service_types.values()
                 )
             
             with col3:
@@ -821,9 +4110,14 @@ def show_clients():
             # Apply filters and search
             filtered_clients = {}
             
+            # Search matches name, contact and email words by prefix or near miss
+            matching_ids = None
+            if search_term.strip():
+                matching_ids = {key[1] for key in search_records(search_term, limit=None, kinds=("client",))}
+            
             for client_id, client in st.session_state.clients.items():
                 # Apply search
-                if search_term and search_term.lower() not in client["name"].lower() and search_term.lower() not in client.get("contact_person", "").lower():
+                if matching_ids is not None and client_id not in matching_ids:
                     continue
                 
                 # Apply service filter
@@ -936,11 +4230,11 @@ def show_clients():
                         "reservations": []
                     }
                     
-                    # Add to session state
-                    st.session_state.clients[client_id] = new_client
+                    # Add to session state and storage
+                    add_client(new_client)
                     save_data()
                     
-                    log_activity("client", f"Added new client: {client_name}")
+                    log_activity("client", f"Added new client: {client_name}", client_id=client_id)
                     add_notification(f"Client '{client_name}' added successfully!", "success")
                     
                     st.success(f"Client '{client_name}' added successfully!")
@@ -1016,20 +4310,20 @@ def show_client_details():
                         st.error("Please fill in all required fields (marked with *)")
                     else:
                         # Update client information
-                        client["name"] = client_name
-                        client["contact_person"] = contact_person
-                        client["email"] = email
-                        client["phone"] = phone
-                        client["address"] = address
-                        client["service_type"] = service_type
-                        client["notes"] = notes
-                        client["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        
                         # Save changes
-                        st.session_state.clients[st.session_state.current_client] = client
+                        update_client(st.session_state.current_client, {
+                            "name": client_name,
+                            "contact_person": contact_person,
+                            "email": email,
+                            "phone": phone,
+                            "address": address,
+                            "service_type": service_type,
+                            "notes": notes,
+                            "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                        })
                         save_data()
                         
-                        log_activity("client", f"Updated client information: {client_name}")
+                        log_activity("client", f"Updated client information: {client_name}", client_id=st.session_state.current_client)
                         add_notification(f"Client '{client_name}' updated successfully!", "success")
                         
                         st.success(f"Client '{client_name}' updated successfully!")
@@ -1073,10 +4367,10 @@ def show_client_details():
                     if confirm_delete == client["name"]:
                         # Delete the client
                         client_name = client["name"]
-                        del st.session_state.clients[st.session_state.current_client]
+                        delete_client(st.session_state.current_client)
                         save_data()
                         
-                        log_activity("client", f"Deleted client: {client_name}")
+                        log_activity("client", f"Deleted client: {client_name}", client_id=st.session_state.current_client)
                         add_notification(f"Client '{client_name}' deleted successfully!", "success")
                         
                         st.success(f"Client '{client_name}' deleted successfully!")
@@ -1088,9 +4382,9 @@ def show_client_details():
         # Reservations for this client
         st.subheader("Reservations")
         
-        reservations = client.get("reservations", [])
+        reservations = client_reservation_frame(st.session_state.current_client)
         
-        if not reservations:
+        if not len(reservations):
             st.info("No reservations found for this client.")
             
             if st.button("Add New Reservation"):
@@ -1107,11 +4401,8 @@ def show_client_details():
                 )
             
             with col2:
-                # Get unique property names
-                property_names = ["All"]
-                for reservation in reservations:
-                    if "property_name" in reservation and reservation["property_name"] not in property_names:
-                        property_names.append(reservation["property_name"])
+                # Property names come from the maintained value table
+                property_names = ["All"] + get_data_store().reservations.property_names(st.session_state.current_client)
                 
                 filter_property = st.selectbox("Filter by Property", options=property_names)
             
@@ -1121,35 +4412,35 @@ def show_client_details():
                     options=["Check-in Date (Newest)", "Check-in Date (Oldest)", "Property Name"]
                 )
             
-            # Apply filters
-            filtered_reservations = reservations.copy()
+            # Apply filters: date windows come from the interval index, field
+            # filters from the secondary indexes
+            filters = {"client_id": st.session_state.current_client}
+            candidates = None
             
-            # Filter by status
-            today = datetime.now().date()
+            # Filter by status (reservations without a date count as upcoming and past)
+            today = pd.Timestamp(datetime.now().date())
             if filter_status == "Upcoming":
-                filtered_reservations = [
-                    r for r in filtered_reservations 
-                    if datetime.strptime(r.get("check_in_date", "2099-01-01"), "%Y-%m-%d").date() >= today
-                ]
+                candidates = reservation_intervals(st.session_state.current_client).starting_from(today).index
             elif filter_status == "Past":
-                filtered_reservations = [
-                    r for r in filtered_reservations 
-                    if datetime.strptime(r.get("check_out_date", "2000-01-01"), "%Y-%m-%d").date() < today
-                ]
+                candidates = reservation_intervals(st.session_state.current_client).ending_before(today).index
             elif filter_status == "Cancelled":
-                filtered_reservations = [r for r in filtered_reservations if r.get("status") == "Cancelled"]
+                filters["status"] = "Cancelled"
             
             # Filter by property
             if filter_property != "All":
-                filtered_reservations = [r for r in filtered_reservations if r.get("property_name") == filter_property]
+                filters["property_name"] = filter_property
+            
+            filtered = select_reservations(candidates, **filters)
             
             # Sort reservations
             if sort_by == "Check-in Date (Newest)":
-                filtered_reservations.sort(key=lambda x: x.get("check_in_date", ""), reverse=True)
+                filtered = filtered.sort_values("check_in", ascending=False, kind="stable")
             elif sort_by == "Check-in Date (Oldest)":
-                filtered_reservations.sort(key=lambda x: x.get("check_in_date", ""))
+                filtered = filtered.sort_values("check_in", kind="stable", na_position="first")
             elif sort_by == "Property Name":
-                filtered_reservations.sort(key=lambda x: x.get("property_name", ""))
+                filtered = filtered.sort_values("property_name", key=lambda names: names.astype(str), kind="stable")
+            
+            filtered_reservations = filtered["record"].tolist()
             
             # Add new reservation button
             if st.button("Add New Reservation"):
@@ -1175,6 +4466,7 @@ def show_client_details():
                             st.write(f"**Check-in:** {reservation.get('check_in_date', 'Unknown')}")
                             st.write(f"**Check-out:** {reservation.get('check_out_date', 'Unknown')}")
                             st.write(f"**Guests:** {reservation.get('num_guests', '0')}")
+                            st.write(f"**Amount:** {format_currency(reservation_amount(reservation))}")
                             st.write(f"**Status:** {reservation.get('status', 'Active')}")
                         
                         with col3:
@@ -1189,55 +4481,33 @@ def show_client_details():
                             
                             if reservation.get("status") != "Cancelled" and st.button("Cancel", key=f"cancel_res_{reservation.get('id', '')}"):
                                 # Mark the reservation as cancelled
-                                for i, res in enumerate(client["reservations"]):
-                                    if res.get("id") == reservation.get("id"):
-                                        client["reservations"][i]["status"] = "Cancelled"
-                                        client["reservations"][i]["cancelled_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                        client["reservations"][i]["cancelled_by"] = st.session_state.current_user
-                                        
-                                        save_data()
-                                        
-                                        log_activity("reservation", f"Cancelled reservation for {reservation.get('property_name', 'Unknown Property')}")
-                                        add_notification(f"Reservation cancelled successfully!", "success")
-                                        
-                                        st.success("Reservation cancelled successfully!")
-                                        st.experimental_rerun()
-                                        break
+                                if cancel_reservation(reservation.get("id")):
+                                    save_data()
+                                    
+                                    log_activity("reservation", f"Cancelled reservation for {reservation.get('property_name', 'Unknown Property')}", client_id=st.session_state.current_client)
+                                    add_notification(f"Reservation cancelled successfully!", "success")
+                                    
+                                    st.success("Reservation cancelled successfully!")
+                                    st.experimental_rerun()
     
     with tab3:
         # Analytics for this client
         st.subheader("Client Analytics")
         
         # Calculate metrics
-        reservations = client.get("reservations", [])
+        reservations = client_reservation_frame(st.session_state.current_client)
         total_reservations = len(reservations)
         
         # Active reservations
-        active_reservations = len([r for r in reservations if r.get("status") != "Cancelled"])
+        active_reservations = int((reservations["status"] != "Cancelled").sum())
         
         # Calculate upcoming reservations
-        today = datetime.now().date()
-        upcoming_reservations = 0
-        
-        for reservation in reservations:
-            try:
-                check_in_date = datetime.strptime(reservation.get("check_in_date", ""), "%Y-%m-%d").date()
-                if today <= check_in_date and reservation.get("status") != "Cancelled":
-                    upcoming_reservations += 1
-            except:
-                pass
+        today = pd.Timestamp(datetime.now().date())
+        upcoming = reservation_intervals(st.session_state.current_client).starting_from(today, include_undated=False)
+        upcoming_reservations = int((upcoming["status"] != "Cancelled").sum())
         
-        # Calculate total nights
-        total_nights = 0
-        
-        for reservation in reservations:
-            try:
-                check_in_date = datetime.strptime(reservation.get("check_in_date", ""), "%Y-%m-%d").date()
-                check_out_date = datetime.strptime(reservation.get("check_out_date", ""), "%Y-%m-%d").date()
-                nights = (check_out_date - check_in_date).days
-                total_nights += nights
-            except:
-                pass
+        # Calculate total nights (rows missing either date are skipped by the sum)
+        total_nights = int((reservations["check_out"] - reservations["check_in"]).dt.days.sum())
         
         # Display metrics
         col1, col2, col3, col4 = st.columns(4)
@@ -1260,19 +4530,13 @@ def show_client_details():
             
             with col1:
                 # Reservations by property
-                property_counts = {}
-                
-                for reservation in reservations:
-                    property_name = reservation.get("property_name", "Unknown")
-                    if property_name in property_counts:
-                        property_counts[property_name] += 1
-                    else:
-                        property_counts[property_name] = 1
+                property_counts = reservations["property_name"].value_counts(sort=False)
+                property_counts = property_counts[property_counts > 0]
                 
                 # Create DataFrame for chart
                 property_df = pd.DataFrame({
-                    "Property": list(property_counts.keys()),
-                    "Reservations": list(property_counts.values())
+                    "Property": property_counts.index.astype(str),
+                    "Reservations": property_counts.values
                 })
                 
                 fig = px.bar(
@@ -1287,19 +4551,13 @@ def show_client_details():
             
             with col2:
                 # Reservation status breakdown
-                status_counts = {}
-                
-                for reservation in reservations:
-                    status = reservation.get("status", "Active")
-                    if status in status_counts:
-                        status_counts[status] += 1
-                    else:
-                        status_counts[status] = 1
+                status_counts = reservations["status"].value_counts(sort=False)
+                status_counts = status_counts[status_counts > 0]
                 
                 # Create DataFrame for chart
                 status_df = pd.DataFrame({
-                    "Status": list(status_counts.keys()),
-                    "Count": list(status_counts.values())
+                    "Status": status_counts.index.astype(str),
+                    "Count": status_counts.values
                 })
                 
                 fig = px.pie(
@@ -1315,43 +4573,19 @@ def show_client_details():
             st.subheader("Reservations Over Time")
             
             # Prepare data
-            dates = []
-            for reservation in reservations:
-                try:
-                    created_at = datetime.strptime(reservation.get("created_at", ""), "%Y-%m-%d %H:%M:%S").date()
-                    dates.append(created_at)
-                except:
-                    pass
-            
-            if dates:
-                # Create a date range
-                min_date = min(dates)
-                max_date = max(dates)
-                date_range = pd.date_range(start=min_date, end=max_date)
-                
-                # Count reservations by date
-                date_counts = {}
-                for date in date_range:
-                    date_str = date.strftime("%Y-%m-%d")
-                    date_counts[date_str] = 0
-                
-                for date in dates:
-                    date_str = date.strftime("%Y-%m-%d")
-                    if date_str in date_counts:
-                        date_counts[date_str] += 1
+            dates = reservations["created_at"].dropna().dt.normalize()
+            
+            if len(dates):
+                # Count reservations by date over the full date range
+                date_range = pd.date_range(start=dates.min(), end=dates.max())
+                date_counts = dates.value_counts().reindex(date_range, fill_value=0)
                 
                 # Create DataFrame for chart
                 date_df = pd.DataFrame({
-                    "Date": list(date_counts.keys()),
-                    "Reservations": list(date_counts.values())
+                    "Date": date_range,
+                    "Reservations": date_counts.values
                 })
                 
-                # Convert Date to datetime
-                date_df["Date"] = pd.to_datetime(date_df["Date"])
-                
-                # Sort by date
-                date_df = date_df.sort_values("Date")
-                
                 # Calculate cumulative sum
                 date_df["Cumulative"] = date_df["Reservations"].cumsum()
                 
@@ -1372,17 +4606,18 @@ def show_client_details():
         # History and activity log for this client
         st.subheader("Client History")
         
-        # Filter activity log for this client
-        client_activities = [
-            activity for activity in st.session_state.activity_log
+        # Entries recorded for this client, plus older entries that only name it
+        activity_index = get_data_store().activity_index
+        client_activities = activity_index.entries(client_id=st.session_state.current_client) + [
+            activity for activity in activity_index.entries(client_id=None)
             if "client" in activity["type"] and client["name"] in activity["description"]
         ]
         
         if not client_activities:
             st.info("No activity history found for this client.")
         else:
-            # Sort by timestamp (newest first)
-            client_activities.sort(key=lambda x: datetime.strptime(x["timestamp"], "%Y-%m-%d %H:%M:%S"), reverse=True)
+            # Newest first
+            client_activities.sort(key=lambda x: x["timestamp"], reverse=True)
             
             # Display activity log
             for activity in client_activities:
@@ -1404,26 +4639,14 @@ def show_reservations():
     
     with tab1:
         # Collect all reservations
-        all_reservations = []
-        
         if st.session_state.current_client:
             # Only show reservations for the selected client
-            client = st.session_state.clients[st.session_state.current_client]
-            for reservation in client.get("reservations", []):
-                reservation_with_client = reservation.copy()
-                reservation_with_client["client_name"] = client["name"]
-                reservation_with_client["client_id"] = st.session_state.current_client
-                all_reservations.append(reservation_with_client)
+            all_reservations = client_reservation_frame(st.session_state.current_client)
         else:
             # Show reservations for all clients
-            for client_id, client in st.session_state.clients.items():
-                for reservation in client.get("reservations", []):
-                    reservation_with_client = reservation.copy()
-                    reservation_with_client["client_name"] = client["name"]
-                    reservation_with_client["client_id"] = client_id
-                    all_reservations.append(reservation_with_client)
+            all_reservations = st.session_state.reservation_table
         
-        if not all_reservations:
+        if not len(all_reservations):
             st.info("No reservations found. Use the 'Add New Reservation' tab to add your first reservation.")
         else:
             # Filter options
@@ -1436,11 +4659,8 @@ def show_reservations():
                 )
             
             with col2:
-                # Get unique property names
-                property_names = ["All"]
-                for reservation in all_reservations:
-                    if "property_name" in reservation and reservation["property_name"] not in property_names:
-                        property_names.append(reservation["property_name"])
+                # Property names come from the maintained value table
+                property_names = ["All"] + get_data_store().reservations.property_names(st.session_state.current_client)
                 
                 filter_property = st.selectbox("Filter by Property", options=property_names)
             
@@ -1450,37 +4670,49 @@ def show_reservations():
                     options=["Check-in Date (Newest)", "Check-in Date (Oldest)", "Client Name", "Property Name"]
                 )
             
-            # Apply filters
-            filtered_reservations = all_reservations.copy()
+            filter_email = st.text_input("Filter by Guest Email", placeholder="guest@example.com")
+            
+            # Apply filters: date windows come from the interval index, field
+            # filters from the secondary indexes
+            filters = {}
+            candidates = None
+            if st.session_state.current_client:
+                filters["client_id"] = st.session_state.current_client
             
-            # Filter by status
-            today = datetime.now().date()
+            # Filter by status (reservations without a date count as upcoming and past)
+            today = pd.Timestamp(datetime.now().date())
             if filter_status == "Upcoming":
-                filtered_reservations = [
-                    r for r in filtered_reservations 
-                    if datetime.strptime(r.get("check_in_date", "2099-01-01"), "%Y-%m-%d").date() >= today
-                ]
+                candidates = reservation_intervals(st.session_state.current_client).starting_from(today).index
             elif filter_status == "Past":
-                filtered_reservations = [
-                    r for r in filtered_reservations 
-                    if datetime.strptime(r.get("check_out_date", "2000-01-01"), "%Y-%m-%d").date() < today
-                ]
+                candidates = reservation_intervals(st.session_state.current_client).ending_before(today).index
             elif filter_status == "Cancelled":
-                filtered_reservations = [r for r in filtered_reservations if r.get("status") == "Cancelled"]
+                filters["status"] = "Cancelled"
             
             # Filter by property
             if filter_property != "All":
-                filtered_reservations = [r for r in filtered_reservations if r.get("property_name") == filter_property]
+                filters["property_name"] = filter_property
+            
+            # Filter by guest email (exact address, any case)
+            if filter_email.strip():
+                filters["guest_email"] = filter_email
+            
+            filtered = select_reservations(candidates, **filters)
+            
+            filtered = filtered.assign(
+                client_name=filtered["client_id"].astype(str).map(client_name_map()).fillna("Unknown Client")
+            )
             
             # Sort reservations
             if sort_by == "Check-in Date (Newest)":
-                filtered_reservations.sort(key=lambda x: x.get("check_in_date", ""), reverse=True)
+                filtered = filtered.sort_values("check_in", ascending=False, kind="stable")
             elif sort_by == "Check-in Date (Oldest)":
-                filtered_reservations.sort(key=lambda x: x.get("check_in_date", ""))
+                filtered = filtered.sort_values("check_in", kind="stable", na_position="first")
             elif sort_by == "Client Name":
-                filtered_reservations.sort(key=lambda x: x.get("client_name", ""))
+                filtered = filtered.sort_values("client_name", kind="stable")
             elif sort_by == "Property Name":
-                filtered_reservations.sort(key=lambda x: x.get("property_name", ""))
+                filtered = filtered.sort_values("property_name", key=lambda names: names.astype(str), kind="stable")
+            
+            filtered_reservations = list(zip(filtered["client_name"], filtered["record"]))
             
             # Display reservations
             if not filtered_reservations:
@@ -1488,13 +4720,13 @@ def show_reservations():
             else:
                 st.write(f"Showing {len(filtered_reservations)} reservations")
                 
-                for reservation in filtered_reservations:
+                for reservation_client_name, reservation in filtered_reservations:
                     with st.container(border=True):
                         col1, col2, col3 = st.columns([2, 2, 1])
                         
                         with col1:
                             st.subheader(f"{reservation.get('property_name', 'Unknown Property')}")
-                            st.write(f"**Client:** {reservation.get('client_name', 'Unknown Client')}")
+                            st.write(f"**Client:** {reservation_client_name}")
                             st.write(f"**Guest:** {reservation.get('guest_name', 'Unknown Guest')}")
                             st.write(f"**Contact:** {reservation.get('guest_email', '')} | {reservation.get('guest_phone', '')}")
                         
@@ -1502,6 +4734,7 @@ def show_reservations():
                             st.write(f"**Check-in:** {reservation.get('check_in_date', 'Unknown')}")
                             st.write(f"**Check-out:** {reservation.get('check_out_date', 'Unknown')}")
                             st.write(f"**Guests:** {reservation.get('num_guests', '0')}")
+                            st.write(f"**Amount:** {format_currency(reservation_amount(reservation))}")
                             st.write(f"**Status:** {reservation.get('status', 'Active')}")
                         
                         with col3:
@@ -1516,21 +4749,14 @@ def show_reservations():
                             
                             if reservation.get("status") != "Cancelled" and st.button("Cancel", key=f"cancel_res_{reservation.get('id', '')}"):
                                 # Mark the reservation as cancelled
-                                client_id = reservation.get("client_id")
-                                for i, res in enumerate(st.session_state.clients[client_id]["reservations"]):
-                                    if res.get("id") == reservation.get("id"):
-                                        st.session_state.clients[client_id]["reservations"][i]["status"] = "Cancelled"
-                                        st.session_state.clients[client_id]["reservations"][i]["cancelled_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                        st.session_state.clients[client_id]["reservations"][i]["cancelled_by"] = st.session_state.current_user
-                                        
-                                        save_data()
-                                        
-                                        log_activity("reservation", f"Cancelled reservation for {reservation.get('property_name', 'Unknown Property')}")
-                                        add_notification(f"Reservation cancelled successfully!", "success")
-                                        
-                                        st.success("Reservation cancelled successfully!")
-                                        st.experimental_rerun()
-                                        break
+                                if cancel_reservation(reservation.get("id")):
+                                    save_data()
+                                    
+                                    log_activity("reservation", f"Cancelled reservation for {reservation.get('property_name', 'Unknown Property')}", client_id=get_reservation(reservation.get("id"))[0])
+                                    add_notification(f"Reservation cancelled successfully!", "success")
+                                    
+                                    st.success("Reservation cancelled successfully!")
+                                    st.experimental_rerun()
     
     with tab2:
         st.subheader("Add New Reservation")
@@ -1561,6 +4787,7 @@ def show_reservations():
                 check_in_date = st.date_input("Check-in Date*")
                 check_out_date = st.date_input("Check-out Date*")
                 num_guests = st.number_input("Number of Guests*", min_value=1, value=2)
+                amount = st.number_input("Amount ($)", min_value=0.0, value=0.0, step=10.0)
                 
                 client_profile = st.selectbox(
                     "Client Profile",
@@ -1596,6 +4823,7 @@ def show_reservations():
                         "check_in_date": check_in_date.strftime("%Y-%m-%d"),
                         "check_out_date": check_out_date.strftime("%Y-%m-%d"),
                         "num_guests": num_guests,
+                        "amount": amount,
                         "client_profile": client_profile,
                         "notes": notes,
                         "status": "Active",
@@ -1604,17 +4832,21 @@ def show_reservations():
                     }
                     
                     # Add to the client's reservations
-                    if "reservations" not in st.session_state.clients[selected_client_id]:
-                        st.session_state.clients[selected_client_id]["reservations"] = []
-                    
-                    st.session_state.clients[selected_client_id]["reservations"].append(new_reservation)
-                    save_data()
+                    conflicts = add_reservation(selected_client_id, new_reservation)
                     
-                    log_activity("reservation", f"Added new reservation for {property_name}")
-                    add_notification(f"Reservation for '{property_name}' added successfully!", "success")
-                    
-                    st.success(f"Reservation for '{property_name}' added successfully!")
-                    st.experimental_rerun()
+                    if conflicts:
+                        st.error(
+                            f"'{property_name}' is already booked for part of that stay: "
+                            + "; ".join(describe_reservation(conflict) for conflict in conflicts)
+                        )
+                    else:
+                        save_data()
+                        
+                        log_activity("reservation", f"Added new reservation for {property_name}", client_id=selected_client_id)
+                        add_notification(f"Reservation for '{property_name}' added successfully!", "success")
+                        
+                        st.success(f"Reservation for '{property_name}' added successfully!")
+                        st.experimental_rerun()
 
 # Import/Export page
 def show_import_export():
@@ -1639,17 +4871,29 @@ def show_import_export():
         )
         
         # Upload file
-        uploaded_file = st.file_uploader(f"Upload {file_type} File", type=["csv", "xlsx", "xls"])
+        uploaded_file = st.file_uploader(
+            f"Upload {file_type} File",
+            type=["csv"] if file_type == "CSV" else [ext.lstrip(".") for ext in EXCEL_ENGINES]
+        )
         
         if uploaded_file is not None:
-            # Parse file
-            if file_type == "CSV":
+            stream = file_type == "CSV" and import_type == "Reservations" and st.checkbox(
+                "Stream the import in chunks (for large files)",
+                help=f"Reads, checks and saves {IMPORT_CHUNK_ROWS:,} rows at a time instead of loading the whole file first"
+            )
+            
+            # Parse file (only the rows to preview when streaming)
+            if stream:
+                df = parse_csv(uploaded_file, nrows=10)
+                uploaded_file.seek(0)
+            elif file_type == "CSV":
                 df = parse_csv(uploaded_file)
             else:
-                df = parse_excel(uploaded_file)
+                df = parse_excel(uploaded_file, "property_name" if import_type == "Reservations" else None)
             
             if df is not None:
-                st.session_state.imported_data = df
+                if not stream:
+                    st.session_state.imported_data = df
                 st.write("Preview of imported data:")
                 st.dataframe(df.head(10))
                 
@@ -1665,7 +4909,10 @@ def show_import_export():
                             break
                     
                     if st.button("Import Reservations"):
-                        success = import_reservations_from_df(df, selected_client_id)
+                        if stream:
+                            success = stream_reservations_from_csv(uploaded_file, selected_client_id)
+                        else:
+                            success = import_reservations_from_df(df, selected_client_id)
                         if success:
                             st.success(f"Successfully imported reservations for {selected_client_name}!")
                             save_data()
@@ -1762,7 +5009,7 @@ def show_import_export():
             st.markdown(download_link, unsafe_allow_html=True)
             
             # Log export
-            st.session_state.export_history.append({
+            record_export({
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 "user": st.session_state.current_user,
                 "type": export_type,
@@ -1788,6 +5035,9 @@ def show_import_export():
             if submitted:
                 st.session_state.github_token = github_token
                 st.session_state.github_repo = github_repo
+                store = get_data_store()
+                store.github_synced = False
+                store.github_loaded_sha = None
                 
                 log_activity("settings", "Updated GitHub integration settings")
                 add_notification("GitHub configuration updated successfully!", "success")
@@ -1828,7 +5078,7 @@ def show_import_export():
                 # Sort by timestamp (newest first)
                 sorted_history = sorted(
                     st.session_state.import_history,
-                    key=lambda x: datetime.strptime(x["timestamp"], "%Y-%m-%d %H:%M:%S"),
+                    key=lambda x: x["timestamp"],
                     reverse=True
                 )
                 
@@ -1854,7 +5104,7 @@ def show_import_export():
                 # Sort by timestamp (newest first)
                 sorted_history = sorted(
                     st.session_state.export_history,
-                    key=lambda x: datetime.strptime(x["timestamp"], "%Y-%m-%d %H:%M:%S"),
+                    key=lambda x: x["timestamp"],
                     reverse=True
                 )
                 
@@ -1915,36 +5165,28 @@ def show_reservation_summary_report(start_date, end_date, selected_client):
     st.subheader("Reservation Summary Report")
     st.write(f"Period: {start_date} to {end_date}")
     
-    # Collect reservation data
-    reservation_data = []
-    
-    for client_id, client in st.session_state.clients.items():
-        if selected_client == "All Clients" or client["name"] == selected_client:
-            for reservation in client.get("reservations", []):
-                try:
-                    check_in = datetime.strptime(reservation.get("check_in_date", ""), "%Y-%m-%d").date()
-                    check_out = datetime.strptime(reservation.get("check_out_date", ""), "%Y-%m-%d").date()
-                    
-                    # Check if reservation is within the date range
-                    if (check_in <= end_date and check_out >= start_date):
-                        reservation_data.append({
-                            "client": client["name"],
-                            "property": reservation.get("property_name", ""),
-                            "check_in": check_in,
-                            "check_out": check_out,
-                            "nights": (check_out - check_in).days,
-                            "guests": reservation.get("num_guests", 0),
-                            "status": reservation.get("status", "Active")
-                        })
-                except:
-                    pass
+    # Collect reservations overlapping the date range
+    reservations = reservation_intervals().overlapping(start_date, end_date)
+    client_names = reservations["client_id"].astype(str).map(client_name_map())
+    mask = client_names.notna()
+    if selected_client != "All Clients":
+        mask &= client_names == selected_client
+    reservations = reservations[mask]
     
-    if not reservation_data:
+    if not len(reservations):
         st.info("No reservation data available for the selected period and client.")
         return
     
     # Convert to DataFrame
-    df = pd.DataFrame(reservation_data)
+    df = pd.DataFrame({
+        "client": client_names[mask],
+        "property": reservations["property_name"].astype(str),
+        "check_in": reservations["check_in"].dt.date,
+        "check_out": reservations["check_out"].dt.date,
+        "nights": (reservations["check_out"] - reservations["check_in"]).dt.days,
+        "guests": reservations["num_guests"],
+        "status": reservations["status"].astype(str)
+    }).reset_index(drop=True)
     
     # Summary metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -2033,11 +5275,12 @@ def show_client_performance_report(start_date, end_date, selected_client):
     
     # Generate sample client performance data
     client_data = []
+    reservation_counts = st.session_state.reservation_table["client_id"].value_counts()
     
     for client_id, client in st.session_state.clients.items():
         if selected_client == "All Clients" or client["name"] == selected_client:
             # Count reservations
-            reservation_count = len(client.get("reservations", []))
+            reservation_count = int(reservation_counts.get(client_id, 0))
             
             # Generate random metrics for demo
             revenue = np.random.randint(1000, 10000)
@@ -2237,11 +5480,12 @@ def show_occupancy_rates_report(start_date, end_date, selected_client):
     
     # Generate sample property data
     property_data = []
+    reservation_counts = st.session_state.reservation_table["client_id"].value_counts()
     
     for client_id, client in st.session_state.clients.items():
         if selected_client == "All Clients" or client["name"] == selected_client:
             # Generate random properties for demo
-            num_properties = max(1, len(client.get("reservations", [])) // 2)
+            num_properties = max(1, int(reservation_counts.get(client_id, 0)) // 2)
             
             for i in range(num_properties):
                 property_name = f"Property {i+1}"
@@ -2472,7 +5716,7 @@ def show_settings():
                             confirm_delete = st.button(f"Confirm Delete {username}", key=f"confirm_delete_{username}")
                             
                             if confirm_delete:
-                                del st.session_state.users[username]
+                                delete_user(username)
                                 log_activity("user", f"Deleted user: {username}")
                                 add_notification(f"User '{username}' deleted successfully!", "success")
                                 save_data()
@@ -2505,9 +5749,7 @@ def show_settings():
                 
                 if submitted:
                     # Update user information
-                    st.session_state.users[username]['name'] = name
-                    st.session_state.users[username]['email'] = email
-                    st.session_state.users[username]['role'] = role
+                    updated_user = {**user, "name": name, "email": email, "role": role}
                     
                     if change_password:
                         if not new_password:
@@ -2516,7 +5758,9 @@ def show_settings():
                             st.error("Passwords do not match.")
                         else:
                             # Update password
-                            st.session_state.users[username]['password_hash'] = hashlib.sha256(new_password.encode()).hexdigest()
+                            updated_user['password_hash'] = hashlib.sha256(new_password.encode()).hexdigest()
+                    
+                    save_user(username, updated_user)
                     
                     log_activity("user", f"Updated user information: {username}")
                     add_notification(f"User '{username}' updated successfully!", "success")
@@ -2557,12 +5801,12 @@ def show_settings():
                     st.error("Passwords do not match.")
                 else:
                     # Add new user
-                    st.session_state.users[new_username] = {
+                    save_user(new_username, {
                         "password_hash": hashlib.sha256(new_password.encode()).hexdigest(),
                         "role": new_role,
                         "name": new_name,
                         "email": new_email
-                    }
+                    })
                     
                     log_activity("user", f"Added new user: {new_username}")
                     add_notification(f"User '{new_username}' added successfully!", "success")
@@ -2587,18 +5831,19 @@ def show_settings():
                         "clients": st.session_state.clients,
                         "users": st.session_state.users,
                         "activity_log": st.session_state.activity_log,
+                        "activity_archive": archive_segments(),
                         "import_history": st.session_state.import_history,
                         "export_history": st.session_state.export_history,
                         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     }
                     
-                    # Convert to JSON
-                    backup_json = json.dumps(backup_data, indent=2, default=str)
+                    # Convert to a compressed snapshot
+                    backup_snapshot = encode_snapshot(backup_data)
                     
                     # Create download link
-                    b64 = base64.b64encode(backup_json.encode()).decode()
-                    filename = f"videmi_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                    href = f'<a href="data:application/json;base64,{b64}" download="{filename}" class="download-button">Download Backup File</a>'
+                    b64 = base64.b64encode(backup_snapshot).decode()
+                    filename = f"videmi_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}{SNAPSHOT_EXTENSION}"
+                    href = f'<a href="data:application/gzip;base64,{b64}" download="{filename}" class="download-button">Download Backup File</a>'
                     
                     st.markdown(href, unsafe_allow_html=True)
                     
@@ -2606,12 +5851,12 @@ def show_settings():
                     add_notification("Backup created successfully!", "success")
             
             with col2:
-                uploaded_file = st.file_uploader("Restore from Backup", type=["json"])
+                uploaded_file = st.file_uploader("Restore from Backup", type=["gz", "json"])
                 
                 if uploaded_file is not None:
                     try:
-                        # Read and parse backup file
-                        backup_data = json.loads(uploaded_file.getvalue().decode())
+                        # Read and parse backup file (compressed snapshot or older plain JSON backup)
+                        backup_data, _ = decode_snapshot(uploaded_file.getvalue())
                         
                         # Validate backup data
                         if "clients" not in backup_data or "users" not in backup_data:
@@ -2619,11 +5864,7 @@ def show_settings():
                         else:
                             if st.button("Restore Data"):
                                 # Restore data
-                                st.session_state.clients = backup_data.get("clients", {})
-                                st.session_state.users = backup_data.get("users", st.session_state.users)
-                                st.session_state.activity_log = backup_data.get("activity_log", [])
-                                st.session_state.import_history = backup_data.get("import_history", [])
-                                st.session_state.export_history = backup_data.get("export_history", [])
+                                replace_all_data(backup_data)
                                 
                                 log_activity("restore", "Restored data from backup")
                                 add_notification("Data restored successfully!", "success")
@@ -2651,7 +5892,7 @@ def show_settings():
                 }
                 
                 # Convert to JSON
-                export_json = json.dumps(export_data, indent=2, default=str)
+                export_json = json.dumps(export_data, indent=2, default=json_default)
                 
                 # Create download link
                 b64 = base64.b64encode(export_json.encode()).decode()
@@ -2678,30 +5919,27 @@ def show_settings():
                 if confirm_clear == "CONFIRM":
                     if clear_type == "All Data":
                         # Keep users but clear everything else
-                        st.session_state.clients = {}
-                        st.session_state.activity_log = []
-                        st.session_state.import_history = []
-                        st.session_state.export_history = []
+                        replace_all_data({"users": st.session_state.users})
+                        clear_activity_log()
                         
                         log_activity("clear", "Cleared all data")
                         add_notification("All data cleared successfully!", "success")
                     
                     elif clear_type == "Clients Only":
-                        st.session_state.clients = {}
+                        clear_clients()
                         
                         log_activity("clear", "Cleared all clients")
                         add_notification("All clients cleared successfully!", "success")
                     
                     elif clear_type == "Reservations Only":
                         # Clear reservations for all clients
-                        for client_id in st.session_state.clients:
-                            st.session_state.clients[client_id]["reservations"] = []
+                        clear_reservations()
                         
                         log_activity("clear", "Cleared all reservations")
                         add_notification("All reservations cleared successfully!", "success")
                     
                     elif clear_type == "Activity Log":
-                        st.session_state.activity_log = []
+                        clear_activity_log()
                         
                         log_activity("clear", "Cleared activity log")
                         add_notification("Activity log cleared successfully!", "success")
@@ -2714,6 +5952,7 @@ def show_settings():
     
     with tab4:
         st.subheader("System Logs")
+        activity_index = get_data_store().activity_index
         
         # Filter options
         col1, col2 = st.columns(2)
@@ -2721,26 +5960,32 @@ def show_settings():
         with col1:
             log_type = st.selectbox(
                 "Filter by Type",
-                options=["All", "auth", "client", "reservation", "import", "export", "backup", "restore", "clear", "settings", "user", "github"]
+                options=["All"] + activity_index.values("type")
             )
         
         with col2:
             log_user = st.selectbox(
                 "Filter by User",
-                options=["All"] + list(st.session_state.users.keys())
+                options=["All"] + activity_index.values("user")
             )
         
-        # Apply filters
-        filtered_logs = st.session_state.activity_log.copy()
+        archive = get_data_store().activity_archive
+        include_archived = st.checkbox(
+            f"Include archived logs ({sum(segment['count'] for segment in archive)} older entries)",
+            disabled=not archive
+        )
         
-        if log_type != "All":
-            filtered_logs = [log for log in filtered_logs if log["type"] == log_type]
+        # Apply filters (the log is kept in time order)
+        filters = {field: value for field, value in (("type", log_type), ("user", log_user)) if value != "All"}
+        filtered_logs = activity_index.entries(**filters)
+        if filtered_logs is None:
+            filtered_logs = st.session_state.activity_log
         
-        if log_user != "All":
-            filtered_logs = [log for log in filtered_logs if log["user"] == log_user]
+        if include_archived:
+            filtered_logs = archived_activity(**filters) + filtered_logs
         
-        # Sort by timestamp (newest first)
-        filtered_logs.sort(key=lambda x: datetime.strptime(x["timestamp"], "%Y-%m-%d %H:%M:%S"), reverse=True)
+        # Newest first
+        filtered_logs = filtered_logs[::-1]
         
         # Display logs
         if not filtered_logs:
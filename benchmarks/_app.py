@@ -0,0 +1,7 @@
+"""Make the shared app loader in tests/conftest.py importable from the benchmark scripts"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+
+from conftest import load_app
@@ -0,0 +1,73 @@
+"""Memory per reservation: plain dicts vs Reservation records
+
+Usage: python benchmarks/record_memory.py [count]
+
+Reservations are decoded from JSON one by one, as the database and GitHub
+loaders do, so no string is shared between records unless the record type
+shares it.
+"""
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+from _app import load_app
+
+PROPERTIES = [f"Property {number}" for number in range(50)]
+PROFILES = ["Regular Stay", "Long-term Rental", "Business Trip", "Vacation", "Other"]
+STATUSES = ["Active", "Active", "Active", "Cancelled"]
+
+def synthetic_rows(count, seed=0):
+    """JSON rows for count reservations shaped like the ones the app creates"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    rows = []
+    for number in range(count):
+        check_in = start + timedelta(days=rng.randint(0, 730))
+        created_at = check_in - timedelta(days=rng.randint(1, 90), seconds=rng.randint(0, 86399))
+        rows.append(json.dumps({
+            "id": f"res-{number:08d}-{rng.getrandbits(64):016x}",
+            "property_name": rng.choice(PROPERTIES),
+            "guest_name": f"Guest {rng.randint(1, 50000)}",
+            "guest_email": f"guest{rng.randint(1, 50000)}@example.com",
+            "guest_phone": f"+1{rng.randint(2000000000, 9999999999)}",
+            "check_in_date": check_in.strftime("%Y-%m-%d"),
+            "check_out_date": (check_in + timedelta(days=rng.randint(1, 14))).strftime("%Y-%m-%d"),
+            "num_guests": rng.randint(1, 6),
+            "client_profile": rng.choice(PROFILES),
+            "notes": "",
+            "status": rng.choice(STATUSES),
+            "created_at": created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "created_by": "admin"
+        }))
+    return rows
+
+def measure(build, rows):
+    """Bytes allocated per row by build, kept alive until measured"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = build(rows)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return (after - before) / len(rows)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    app = load_app()
+    Reservation = app["Reservation"]
+    rows = synthetic_rows(count)
+
+    as_dicts = measure(lambda rows: [json.loads(row) for row in rows], rows)
+    as_records = measure(lambda rows: [Reservation(json.loads(row)) for row in rows], rows)
+
+    print(f"{count} synthetic reservations")
+    print(f"  dict:        {as_dicts:8.1f} bytes per reservation")
+    print(f"  Reservation: {as_records:8.1f} bytes per reservation")
+    print(f"  saving:      {1 - as_records / as_dicts:8.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Preparing an import batch: row by row vs column by column
+
+Usage: python benchmarks/reservation_import.py [rows]
+
+Both sides turn an uploaded DataFrame into Reservation records plus the
+reservation frame that add_reservations checks for overbooking and appends.
+The row-by-row side is the import loop the app used before
+prepare_reservation_import replaced it.
+"""
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from _app import load_app
+
+PROPERTIES = [f"Property {number}" for number in range(50)]
+STATUSES = ["Active", "Active", "Active", "Cancelled"]
+
+def synthetic_export(count, seed=0):
+    """A channel export of count bookings, dates in the US format some channels use"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    check_ins = [start + timedelta(days=rng.randint(0, 730)) for _ in range(count)]
+    return pd.DataFrame({
+        "property_name": [rng.choice(PROPERTIES) for _ in range(count)],
+        "guest_name": [f"Guest {rng.randint(1, 50000)}" for _ in range(count)],
+        "guest_email": [f"guest{rng.randint(1, 50000)}@example.com" for _ in range(count)],
+        "check_in_date": [day.strftime("%m/%d/%Y") for day in check_ins],
+        "check_out_date": [(day + timedelta(days=rng.randint(1, 14))).strftime("%m/%d/%Y") for day in check_ins],
+        "num_guests": [rng.randint(1, 6) for _ in range(count)],
+        "amount": [round(rng.uniform(50, 900), 2) for _ in range(count)],
+        "status": [rng.choice(STATUSES) for _ in range(count)]
+    })
+
+def row_by_row(app, df, client_id):
+    """The previous import loop, up to the frame add_reservations built from its records"""
+    df = df.copy()
+    for column in ("check_in_date", "check_out_date"):
+        df[column] = app["normalize_date_column"](df[column], app["SNAPSHOT_FIELD_TYPES"][column])
+
+    new_reservations = []
+    for _, row in df.iterrows():
+        new_reservations.append({
+            "id": f"res-{uuid.uuid4()}",
+            "property_name": row.get("property_name", ""),
+            "guest_name": row.get("guest_name", ""),
+            "guest_email": row.get("guest_email", ""),
+            "guest_phone": row.get("guest_phone", ""),
+            "check_in_date": row.get("check_in_date", ""),
+            "check_out_date": row.get("check_out_date", ""),
+            "num_guests": row.get("num_guests", 1),
+            "amount": row.get("amount", 0),
+            "client_profile": row.get("client_profile", "Regular Stay"),
+            "notes": row.get("notes", ""),
+            "status": row.get("status", "Active"),
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "imported": True
+        })
+
+    reservations = [app["compact_reservation"](reservation) for reservation in new_reservations]
+    return reservations, app["ReservationTable"]._frame([(client_id, reservation) for reservation in reservations])
+
+def column_by_column(app, df, client_id):
+    reservations, batch, _, _ = app["prepare_reservation_import"](df, client_id)
+    return reservations, batch
+
+def best_of(runs, prepare, *args):
+    """Fastest of several runs, in seconds"""
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        prepare(*args)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    app = load_app()
+    df = synthetic_export(count)
+
+    before = best_of(3, row_by_row, app, df, "client")
+    after = best_of(3, column_by_column, app, df, "client")
+
+    print(f"{count} rows")
+    print(f"  row by row:       {before * 1000:9.1f} ms")
+    print(f"  column by column: {after * 1000:9.1f} ms")
+    print(f"  speedup:          {before / after:9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Reading the sheets of an uploaded workbook in worker processes
+
+This lives outside app.py so worker processes can import it without running
+the app. Workers are spawned (or started by a fork server) rather than forked
+from the multi-threaded Streamlit server.
+"""
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+
+import pandas as pd
+
+def read_excel_sheet(data, engine, sheet_name):
+    """One sheet of a workbook as a DataFrame (pandas opens .xlsx with openpyxl in read-only mode)"""
+    return pd.read_excel(BytesIO(data), sheet_name=sheet_name, engine=engine)
+
+@contextmanager
+def _workers_start_here():
+    """Have worker processes started in this block take this module as their __main__
+
+    A new worker first re-runs the parent's __main__. Under Streamlit that is
+    the app script, so it is swapped for this module while workers start.
+    """
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = sys.modules[__name__]
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+def read_excel_sheets(data, engine, sheet_names, workers):
+    """DataFrames for the given sheets of a workbook, read by a pool of worker processes"""
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        # Workers start as sheets are submitted, so submit them all inside the block
+        with _workers_start_here():
+            futures = [executor.submit(read_excel_sheet, data, engine, sheet_name) for sheet_name in sheet_names]
+        return [future.result() for future in futures]
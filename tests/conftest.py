@@ -0,0 +1,17 @@
+"""Shared helpers for the tests and benchmarks, which load app.py outside a Streamlit server"""
+import logging
+import os
+import runpy
+import sys
+import tempfile
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+def load_app(run_name="app"):
+    """Run app.py in bare mode against a throwaway database (unless VIDEMI_DB_PATH is set) and return its globals"""
+    os.environ.setdefault("VIDEMI_DB_PATH", os.path.join(tempfile.mkdtemp(), f"{run_name}.db"))
+    logging.disable(logging.WARNING)
+    # Streamlit puts the script's folder on the path, which app.py relies on for its helper modules
+    if os.path.dirname(APP_PATH) not in sys.path:
+        sys.path.insert(0, os.path.dirname(APP_PATH))
+    return runpy.run_path(APP_PATH, run_name=run_name)
@@ -0,0 +1,337 @@
+"""Batched GitHub commits and shard merges against a local fake of the Git Data and contents APIs"""
+import base64
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+import pytest
+
+from conftest import load_app
+
+REPO = "acme/data"
+TOKEN = "test-token"
+
+class FakeRepository:
+    """In-memory git objects and a single main branch"""
+
+    def __init__(self):
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.head = None
+        self.requests = []
+        self.before_ref_update = None
+
+    def put_blob(self, content):
+        sha = hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+        self.blobs[sha] = content
+        return sha
+
+    def put_tree(self, paths):
+        sha = hashlib.sha1(json.dumps(sorted(paths.items())).encode()).hexdigest()
+        self.trees[sha] = dict(paths)
+        return sha
+
+    def put_commit(self, tree, parents, message):
+        sha = hashlib.sha1(json.dumps([tree, parents, message, len(self.commits)]).encode()).hexdigest()
+        self.commits[sha] = {"tree": tree, "parents": parents, "message": message}
+        return sha
+
+    def files(self, commit=None):
+        commit = commit or self.head
+        return self.trees[self.commits[commit]["tree"]] if commit else {}
+
+    def read(self, path):
+        paths = self.files()
+        return self.blobs[paths[path]] if path in paths else None
+
+    def write(self, files, message="seed"):
+        """Commit {path: bytes or None} straight to the branch, as another client would"""
+        paths = dict(self.files())
+        for path, content in files.items():
+            if content is None:
+                paths.pop(path, None)
+            else:
+                paths[path] = self.put_blob(content)
+        self.head = self.put_commit(self.put_tree(paths), [self.head] if self.head else [], message)
+        return self.head
+
+    def count(self, method, pattern):
+        return sum(1 for request in self.requests if request[0] == method and re.fullmatch(pattern, request[1]))
+
+class FakeGithubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    repository = None
+    base_url = None
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=None):
+        content = b"" if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def url(self, path):
+        return f"{self.base_url}/repos/{REPO}{path}"
+
+    def commit_json(self, sha):
+        commit = self.repository.commits[sha]
+        return {
+            "sha": sha, "url": self.url(f"/git/commits/{sha}"), "message": commit["message"],
+            "tree": {"sha": commit["tree"], "url": self.url(f"/git/trees/{commit['tree']}")},
+            "parents": [{"sha": parent, "url": self.url(f"/git/commits/{parent}")} for parent in commit["parents"]]
+        }
+
+    def tree_json(self, sha):
+        return {
+            "sha": sha, "url": self.url(f"/git/trees/{sha}"), "truncated": False,
+            "tree": [
+                {"path": path, "mode": "100644", "type": "blob", "sha": blob, "url": self.url(f"/git/blobs/{blob}")}
+                for path, blob in sorted(self.repository.trees[sha].items())
+            ]
+        }
+
+    def ref_json(self):
+        head = self.repository.head
+        return {
+            "ref": "refs/heads/main", "url": self.url("/git/refs/heads/main"),
+            "object": {"sha": head, "type": "commit", "url": self.url(f"/git/commits/{head}")}
+        }
+
+    def handle_request(self, method):
+        repository = self.repository
+        path = urlparse(self.path).path
+        repository.requests.append((method, path))
+        prefix = f"/repos/{REPO}"
+        if path == prefix:
+            return self.reply(200, {"full_name": REPO, "name": "data", "default_branch": "main", "url": self.url("")})
+        rest = path[len(prefix):]
+
+        if re.fullmatch(r"/git/refs?/heads/main", rest):
+            if method == "GET":
+                if repository.head is None:
+                    return self.reply(409, {"message": "Git Repository is empty."})
+                return self.reply(200, self.ref_json())
+            if method == "PATCH":
+                sha = self.body()["sha"]
+                if repository.before_ref_update:
+                    hook, repository.before_ref_update = repository.before_ref_update, None
+                    hook()
+                if repository.head not in repository.commits[sha]["parents"]:
+                    return self.reply(422, {"message": "Update is not a fast forward"})
+                repository.head = sha
+                return self.reply(200, self.ref_json())
+
+        match = re.fullmatch(r"/git/(commits|trees|blobs)(?:/(\w+))?", rest)
+        if match:
+            kind, sha = match.groups()
+            if method == "GET" and kind == "commits":
+                return self.reply(200, self.commit_json(sha))
+            if method == "GET" and kind == "trees":
+                return self.reply(200, self.tree_json(sha))
+            if method == "GET" and kind == "blobs":
+                content = repository.blobs[sha]
+                return self.reply(200, {
+                    "sha": sha, "size": len(content), "encoding": "base64",
+                    "content": base64.b64encode(content).decode(), "url": self.url(f"/git/blobs/{sha}")
+                })
+            body = self.body()
+            if kind == "commits":
+                return self.reply(201, self.commit_json(repository.put_commit(body["tree"], body["parents"], body["message"])))
+            if kind == "trees":
+                paths = dict(repository.trees[body["base_tree"]]) if body.get("base_tree") else {}
+                for element in body["tree"]:
+                    if element.get("sha") is None:
+                        paths.pop(element["path"], None)
+                    else:
+                        paths[element["path"]] = element["sha"]
+                return self.reply(201, self.tree_json(repository.put_tree(paths)))
+            sha = repository.put_blob(base64.b64decode(body["content"]))
+            return self.reply(201, {"sha": sha, "url": self.url(f"/git/blobs/{sha}")})
+
+        match = re.fullmatch(r"/contents/(.+)", rest)
+        if match:
+            file_path = unquote(match.group(1))
+            paths = repository.files()
+            if method == "GET":
+                if file_path not in paths:
+                    return self.reply(404, {"message": "Not Found"})
+                content = repository.blobs[paths[file_path]]
+                return self.reply(200, {
+                    "type": "file", "path": file_path, "name": file_path.rsplit("/", 1)[-1], "sha": paths[file_path],
+                    "encoding": "base64", "content": base64.b64encode(content).decode(), "size": len(content),
+                    "url": self.url(f"/contents/{file_path}")
+                })
+            body = self.body()
+            content = base64.b64decode(body["content"]) if method == "PUT" else None
+            repository.write({file_path: content}, body["message"])
+            return self.reply(200 if method == "DELETE" else 201, {
+                "content": None if content is None else {"path": file_path, "sha": repository.files()[file_path]},
+                "commit": self.commit_json(repository.head)
+            })
+
+        return self.reply(404, {"message": f"Not handled: {method} {path}"})
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_PATCH(self):
+        self.handle_request("PATCH")
+
+    def do_PUT(self):
+        self.handle_request("PUT")
+
+    def do_DELETE(self):
+        self.handle_request("DELETE")
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeGithubHandler)
+    FakeGithubHandler.base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield FakeGithubHandler.base_url
+    httpd.shutdown()
+
+@pytest.fixture(scope="module")
+def app(server):
+    """app.py run in bare mode against the fake server and a throwaway database"""
+    os.environ["GITHUB_API_URL"] = server
+    os.environ["VIDEMI_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "test.db")
+    return load_app("test")
+
+@pytest.fixture
+def repository():
+    FakeGithubHandler.repository = FakeRepository()
+    return FakeGithubHandler.repository
+
+def test_adds_and_deletes_land_in_one_commit(app, repository):
+    base = repository.write({"data/a.json": b"a", "data/b.json": b"b", "data/keep.json": b"keep"})
+    connection = app["GithubConnection"](TOKEN, REPO)
+
+    files = {"data/c.json": b"c", "data/d.json": b"d", "data/a.json": None, "data/b.json": None, "data/keep.json": b"keep"}
+    sha, skipped, merged, conflicts = app["commit_files_to_github"](connection, files, "Save data")
+
+    assert sha == repository.head
+    assert repository.commits[sha]["parents"] == [base]
+    assert repository.count("POST", r".*/git/commits") == 1
+    assert repository.count("POST", r".*/git/trees") == 1
+    assert repository.count("PATCH", r".*/git/refs/heads/main") == 1
+    assert (skipped, merged, conflicts) == (1, set(), [])
+    assert {path: repository.read(path) for path in repository.files()} == {
+        "data/c.json": b"c", "data/d.json": b"d", "data/keep.json": b"keep"
+    }
+
+def test_empty_repository_falls_back_to_contents_api(app, repository):
+    skipped, merged, conflicts = app["write_files_to_github"](
+        TOKEN, REPO, {"data/a.json": b"a", "data/b.json": b"b"}, "First save"
+    )
+
+    assert (skipped, merged, conflicts) == (0, 0, [])
+    assert repository.read("data/a.json") == b"a"
+    assert repository.read("data/b.json") == b"b"
+    assert repository.count("PUT", r".*/contents/.*") == 2
+    assert repository.count("POST", r".*/git/commits") == 0
+
+def test_moved_branch_is_retried_on_the_new_head(app, repository):
+    repository.write({"data/a.json": b"a"})
+    connection = app["GithubConnection"](TOKEN, REPO)
+    other = {}
+    repository.before_ref_update = lambda: other.setdefault("sha", repository.write({"data/other.json": b"other"}, "Other save"))
+
+    sha, _, _, _ = app["commit_files_to_github"](connection, {"data/b.json": b"b"}, "Save data")
+
+    assert repository.count("PATCH", r".*/git/refs/heads/main") == 2
+    assert sha == repository.head
+    assert repository.commits[sha]["parents"] == [other["sha"]]
+    assert {path: repository.read(path) for path in repository.files()} == {
+        "data/a.json": b"a", "data/b.json": b"b", "data/other.json": b"other"
+    }
+
+def test_merge_shard_keeps_both_sides_changes(app):
+    merge_shard = app["merge_shard"]
+    base = {"id": "c1", "name": "Villa", "reservations": [{"id": "r1", "status": "Pending"}]}
+    ours = {"id": "c1", "name": "Villa", "reservations": [{"id": "r1", "status": "Confirmed"}, {"id": "r2"}]}
+    theirs = {"id": "c1", "name": "Villa Sol", "reservations": [{"id": "r1", "status": "Pending"}, {"id": "r3"}]}
+
+    merged, conflicts = merge_shard("clients/c1", base, ours, theirs)
+
+    assert conflicts == []
+    assert merged["name"] == "Villa Sol"
+    assert merged["reservations"] == [{"id": "r1", "status": "Confirmed"}, {"id": "r3"}, {"id": "r2"}]
+
+def test_merge_shard_reports_records_changed_on_both_sides(app):
+    merge_shard = app["merge_shard"]
+    base = {"id": "c1", "name": "Villa", "reservations": [{"id": "r1", "status": "Pending"}]}
+    ours = {"id": "c1", "name": "Villa", "reservations": [{"id": "r1", "status": "Confirmed"}]}
+    theirs = {"id": "c1", "name": "Villa", "reservations": [{"id": "r1", "status": "Cancelled"}]}
+
+    merged, conflicts = merge_shard("clients/c1", base, ours, theirs)
+
+    assert conflicts == ["reservation r1 of Villa"]
+    assert merged["reservations"] == [{"id": "r1", "status": "Confirmed"}]
+    assert merge_shard("clients/c1", base, None, theirs) == (None, ["client Villa"])
+    assert merge_shard("clients/c1", base, None, base) == (None, [])
+
+def test_merge_shard_without_base_keeps_both_sides(app):
+    merge_shard = app["merge_shard"]
+    ours = {"id": "c1", "name": "Villa", "reservations": [{"id": "ra"}, {"id": "rc", "status": "Confirmed"}]}
+    theirs = {"id": "c1", "name": "Villa", "reservations": [{"id": "rb"}, {"id": "rc", "status": "Cancelled"}]}
+
+    merged, conflicts = merge_shard("clients/c1", None, ours, theirs)
+
+    assert conflicts == ["reservation rc of Villa"]
+    assert merged["reservations"] == [{"id": "rb"}, {"id": "rc", "status": "Confirmed"}, {"id": "ra"}]
+    assert merge_shard("users", None, {"a": {"role": "admin"}}, {"b": {"role": "staff"}}) == (
+        {"b": {"role": "staff"}, "a": {"role": "admin"}}, []
+    )
+    assert merge_shard("activity_log", None, [{"timestamp": "2"}], [{"timestamp": "1"}]) == (
+        [{"timestamp": "1"}, {"timestamp": "2"}], []
+    )
+
+def test_first_save_of_a_fresh_process_keeps_remote_clients(app, repository):
+    st = app["st"]
+    encode_snapshot, decode_snapshot = app["encode_snapshot"], app["decode_snapshot"]
+    clients_dir = f"{app['GITHUB_DATA_DIR']}/clients"
+
+    # This process only has the client locally, with a reservation of its own
+    client = {"id": "dajo-curacao", "name": "Dajo Curacao", "service_type": "Rental", "created_at": "2024-01-01 00:00:00"}
+    app["add_client"](client)
+    app["add_reservation"]("dajo-curacao", {"id": "ra", "status": "Confirmed"})
+    store = app["get_data_store"]()
+    local = app["build_shard"]("clients/dajo-curacao", {"clients/dajo-curacao": "dajo-curacao"})
+
+    # Another operator already committed a second client and a reservation of their own
+    repository.write({
+        f"{clients_dir}/other.json.gz": encode_snapshot({"id": "other", "name": "Other", "reservations": []}),
+        f"{clients_dir}/dajo-curacao.json.gz": encode_snapshot({**local, "reservations": [{"id": "rb", "status": "Confirmed"}]})
+    })
+
+    st.session_state.github_token, st.session_state.github_repo = TOKEN, REPO
+    try:
+        assert not store.github_synced
+        assert app["save_data"]()
+        writer = app["get_background_writer"]()
+        assert writer.flush()
+    finally:
+        st.session_state.github_token, st.session_state.github_repo = None, None
+
+    assert decode_snapshot(repository.read(f"{clients_dir}/other.json.gz"))[0]["name"] == "Other"
+    merged, _ = decode_snapshot(repository.read(f"{clients_dir}/dajo-curacao.json.gz"))
+    assert sorted(reservation["id"] for reservation in merged["reservations"]) == ["ra", "rb"]
+    assert writer.status()["conflicts"] == []